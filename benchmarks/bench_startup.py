@@ -0,0 +1,76 @@
+# encoding: utf-8
+"""
+Measures how long it takes to load the plugin and to start / stop the servers.
+
+Usage: python benchmarks/bench_startup.py [rounds]
+"""
+from __future__ import absolute_import, division, print_function
+
+import subprocess
+import sys
+from timeit import default_timer
+
+_IMPORT_PLUGIN = """
+import sys
+from timeit import default_timer
+import pytest
+start = default_timer()
+import pytest_sftpserver.plugin
+print(default_timer() - start, 'paramiko' in sys.modules)
+"""
+
+
+def bench_plugin_import(rounds):
+    timings = []
+    for _ in range(rounds):
+        output = subprocess.check_output([sys.executable, "-c", _IMPORT_PLUGIN])
+        duration, paramiko_imported = output.decode().split()
+        timings.append(float(duration))
+    return timings, paramiko_imported == "True"
+
+
+def bench_server(server_class, rounds):
+    start_timings = []
+    stop_timings = []
+    for _ in range(rounds):
+        start = default_timer()
+        server = server_class()
+        server.start()
+        assert server.port
+        start_timings.append(default_timer() - start)
+        start = default_timer()
+        server.shutdown()
+        server.server_close()
+        stop_timings.append(default_timer() - start)
+    return start_timings, stop_timings
+
+
+def _format(timings):
+    timings = sorted(timings)
+    return "min {:8.2f} ms  median {:8.2f} ms".format(
+        timings[0] * 1000, timings[len(timings) // 2] * 1000
+    )
+
+
+def main(rounds=10):
+    # Imports paramiko so it has to happen after the plugin import benchmark
+    timings, paramiko_imported = bench_plugin_import(rounds)
+    print(
+        "plugin import          ",
+        _format(timings),
+        "(paramiko imported: {})".format(paramiko_imported),
+    )
+
+    from pytest_sftpserver.sftp.process import SFTPServerProcess
+    from pytest_sftpserver.sftp.server import SFTPServer
+
+    start_timings, stop_timings = bench_server(SFTPServer, rounds)
+    print("thread server start    ", _format(start_timings))
+    print("thread server shutdown ", _format(stop_timings))
+    start_timings, stop_timings = bench_server(SFTPServerProcess, rounds)
+    print("process server start   ", _format(start_timings))
+    print("process server shutdown", _format(stop_timings))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
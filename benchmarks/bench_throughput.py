@@ -0,0 +1,90 @@
+# encoding: utf-8
+"""
+Measures upload and download throughput for combinations of transport settings.
+
+Usage: python benchmarks/bench_throughput.py [size_mb]
+"""
+from __future__ import absolute_import, division, print_function
+
+import io
+import itertools
+import logging
+import sys
+from timeit import default_timer
+
+from paramiko import Transport
+from paramiko.sftp_client import SFTPClient
+
+from pytest_sftpserver.sftp.server import SFTPServer
+from pytest_sftpserver.sftp.synthetic import RandomFile
+
+CIPHERS = ["aes128-gcm@openssh.com", "aes128-ctr", "aes256-ctr"]
+COMPRESSION = [False, True]
+# (window size, max packet size)
+FLOW_CONTROL = [(2 * 1024 * 1024, 32 * 1024), (16 * 1024 * 1024, 256 * 1024)]
+
+
+def bench(size, cipher, compression, window_size, max_packet_size):
+    server = SFTPServer(
+        {"download": RandomFile(size), "upload": {}},
+        ciphers=[cipher],
+        compression=compression,
+        window_size=window_size,
+        max_packet_size=max_packet_size,
+    )
+    server.start()
+    transport = Transport(
+        (server.host, server.port),
+        default_window_size=window_size,
+        default_max_packet_size=max_packet_size,
+    )
+    transport.use_compression(compression)
+    try:
+        transport.connect(username="a", password="b")
+        sftpclient = SFTPClient.from_transport(transport)
+
+        start = default_timer()
+        with sftpclient.open("/download", "r") as f:
+            f.prefetch(size)
+            while f.read(1024 * 1024):
+                pass
+        download = size / (default_timer() - start)
+
+        data = io.BytesIO(RandomFile(size, seed=1)[:])
+        start = default_timer()
+        sftpclient.putfo(data, "/upload/file", confirm=False)
+        upload = size / (default_timer() - start)
+        return download, upload
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+
+
+def main(size_mb=16):
+    # The server logs every client disconnect
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+    size = size_mb * 1024 * 1024
+    print(
+        "{:24} {:5} {:>7} {:>7} {:>10} {:>10}".format(
+            "cipher", "zlib", "window", "packet", "down MB/s", "up MB/s"
+        )
+    )
+    for cipher, compression, (window_size, max_packet_size) in itertools.product(
+        CIPHERS, COMPRESSION, FLOW_CONTROL
+    ):
+        download, upload = bench(size, cipher, compression, window_size, max_packet_size)
+        print(
+            "{:24} {:5} {:>6}K {:>6}K {:10.2f} {:10.2f}".format(
+                cipher,
+                str(compression),
+                window_size // 1024,
+                max_packet_size // 1024,
+                download / 1024 / 1024,
+                upload / 1024 / 1024,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
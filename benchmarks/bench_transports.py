@@ -0,0 +1,79 @@
+# encoding: utf-8
+"""
+Compares TCP loopback and unix domain socket listeners.
+
+Measures connection setup (including SSH handshake) and download throughput.
+
+Usage: python benchmarks/bench_transports.py [size_mb] [connections]
+"""
+from __future__ import absolute_import, division, print_function
+
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+from timeit import default_timer
+
+from paramiko import Transport
+from paramiko.sftp_client import SFTPClient
+
+from pytest_sftpserver.sftp.server import SFTPServer
+from pytest_sftpserver.sftp.synthetic import RandomFile
+
+
+def bench_connect(listener, connections):
+    start = default_timer()
+    for _ in range(connections):
+        transport = Transport(listener.connect())
+        transport.connect(username="a", password="b")
+        SFTPClient.from_transport(transport).close()
+        transport.close()
+    return (default_timer() - start) / connections
+
+
+def bench_download(listener, size):
+    transport = Transport(listener.connect())
+    transport.connect(username="a", password="b")
+    sftpclient = SFTPClient.from_transport(transport)
+    try:
+        start = default_timer()
+        with sftpclient.open("/file", "r") as f:
+            f.prefetch(size)
+            while f.read(1024 * 1024):
+                pass
+        return size / (default_timer() - start)
+    finally:
+        sftpclient.close()
+        transport.close()
+
+
+def main(size_mb=32, connections=20):
+    # The server logs every client disconnect
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+    size = size_mb * 1024 * 1024
+    tmpdir = tempfile.mkdtemp()
+    addresses = [("127.0.0.1", 0)]
+    if hasattr(socket, "AF_UNIX"):
+        addresses.append(os.path.join(tmpdir, "sftp.sock"))
+    server = SFTPServer({"file": RandomFile(size)}, addresses=addresses)
+    server.start()
+    try:
+        for listener in server.listeners:
+            name = "uds" if listener.path else "tcp"
+            print(
+                "{:4} connect {:7.2f} ms   download {:7.2f} MB/s".format(
+                    name,
+                    bench_connect(listener, connections) * 1000,
+                    bench_download(listener, size) / 1024 / 1024,
+                )
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -3,15 +3,43 @@ from __future__ import absolute_import, division, print_function
 
 import pytest
 
-from pytest_sftpserver.sftp.server import SFTPServer
+from pytest_sftpserver.sftp.listener import parse_address
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("sftpserver")
+    group.addoption(
+        "--sftpserver-process",
+        action="store_true",
+        default=False,
+        help="Run the server of the 'sftpserver' fixture in a separate process.",
+    )
+    group.addoption(
+        "--sftpserver-listen",
+        action="append",
+        default=[],
+        metavar="ADDRESS",
+        help=(
+            "Address the 'sftpserver' fixture listens on. Either 'HOST:PORT', '[IPV6]:PORT' "
+            "or 'unix:PATH'. Can be given multiple times. Default: 127.0.0.1:0"
+        ),
+    )
 
 
 @pytest.yield_fixture(scope="session")
 def sftpserver(request):
-    server = SFTPServer()
+    # Imported here to avoid importing paramiko in test sessions that don't use the fixture
+    if request.config.getoption("sftpserver_process"):
+        from pytest_sftpserver.sftp.process import SFTPServerProcess as server_class
+    else:
+        from pytest_sftpserver.sftp.server import SFTPServer as server_class
+
+    addresses = [parse_address(value) for value in request.config.getoption("sftpserver_listen")]
+    server = server_class(addresses=addresses)
     server.start()
 
     yield server
 
     if server.is_alive():
         server.shutdown()
+    server.server_close()
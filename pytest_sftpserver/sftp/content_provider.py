@@ -1,20 +1,168 @@
 # encoding: utf-8
 from __future__ import absolute_import, division, print_function
 
-from six import binary_type, integer_types, string_types
+import posixpath
+from collections import OrderedDict
+from threading import Condition, Lock
+from timeit import default_timer
+
+from six import binary_type, integer_types, iteritems, string_types
+
+from pytest_sftpserver.sftp.memory import MemoryAccounting, resident_size
+from pytest_sftpserver.sftp.nodes import DirNode, Node, from_nodes, to_nodes
+
+_FILE_TYPES = string_types + integer_types + (binary_type,)
+
+
+# Events passed to subscribers and `wait_for()`. "write" is sent for each write to an open
+# file, "close" when a file that has been written to is closed.
+EVENTS = ("put", "remove", "write", "close")
+
+# Number of paths whose events are remembered for `wait_for()`, the oldest are dropped
+MAX_SEEN_PATHS = 10000
+
+# Number of changed paths tracked for incremental dumps. Beyond that the whole tree is
+# considered changed.
+MAX_CHANGED_PATHS = 1000
+
+
+def _normalize_path(path):
+    if isinstance(path, binary_type):
+        path = path.decode()
+    return posixpath.normpath(posixpath.join("/", path))
 
 
 class ContentProvider(object):
     def __init__(self, content_object=None):
+        # Paths changed through `put()` / `remove()` or by replacing the content object
+        self.changed_paths = set()
+        self._changed_lock = Lock()
+        self._subscribers = []
+        # Sequence number of the last event per path and event since the content object
+        # was set, most recent path last
+        self._seen_events = OrderedDict()
+        self._event_count = 0
+        self._events_changed = Condition()
+        self.memory = MemoryAccounting()
+        # Running total of `get_usage()`, computed on first use
+        self._usage = None
         self.content_object = content_object
 
+    @property
+    def content_object(self):
+        return self._content_object
+
+    @content_object.setter
+    def content_object(self, content_object):
+        self._content_object = content_object
+        self._mark_changed("/")
+        with self._events_changed:
+            self._seen_events.clear()
+        self.memory.reset()
+        self._usage = None
+
+    def _mark_changed(self, *paths):
+        with self._changed_lock:
+            if "/" in self.changed_paths:
+                return
+            self.changed_paths.update(paths)
+            if len(self.changed_paths) > MAX_CHANGED_PATHS:
+                self.changed_paths = set(["/"])
+
+    def take_changed_paths(self):
+        """Return the paths changed since the last call and start tracking anew."""
+        with self._changed_lock:
+            paths, self.changed_paths = self.changed_paths, set()
+        return paths
+
+    def subscribe(self, callback, events=None):
+        """
+        Call ``callback(event, path)`` for every event (or only for those in `events`).
+
+        Callbacks are called from the server's connection threads.
+        """
+        self._subscribers.append((callback, frozenset(events) if events else None))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [s for s in self._subscribers if s[0] is not callback]
+
+    def notify(self, event, path):
+        path = _normalize_path(path)
+        with self._events_changed:
+            self._event_count += 1
+            seen = self._seen_events.pop(path, {})
+            if event == "remove":
+                seen = {}
+            seen[event] = self._event_count
+            self._seen_events[path] = seen
+            while len(self._seen_events) > MAX_SEEN_PATHS:
+                self._seen_events.popitem(last=False)
+            self._events_changed.notify_all()
+        for callback, events in self._subscribers:
+            if events is None or event in events:
+                callback(event, path)
+
+    def mark(self):
+        """Return a token for `wait_for()` to only consider events that happen after now."""
+        with self._events_changed:
+            return self._event_count
+
+    def wait_for(self, path, timeout=None, event="close", since=None):
+        """
+        Block until `event` happened for `path` and return True. Returns False if that
+        doesn't happen within `timeout` seconds.
+
+        Without `since` this returns immediately if the event already happened since the
+        content object was set (or, for events other than "remove", since `path` was last
+        removed). Pass a token from `mark()` as `since` to wait for a later event only.
+        """
+        path = _normalize_path(path)
+        since = since or 0
+        deadline = None if timeout is None else default_timer() + timeout
+        with self._events_changed:
+            while self._seen_events.get(path, {}).get(event, 0) <= since:
+                if deadline is None:
+                    self._events_changed.wait()
+                else:
+                    remaining = deadline - default_timer()
+                    if remaining <= 0:
+                        return False
+                    self._events_changed.wait(remaining)
+            return True
+
     def get(self, path):
         return self._find_object_for_path(path)
 
     def put(self, path, data):
+        self._mark_changed(path)
+        parent, _ = self._get_path_components(path)
+        if self._find_object_for_path(parent) is None:
+            # Don't evict anything for a write that can't succeed
+            return False
+        memory_path = _normalize_path(path)
+        is_file = not self._is_dir_object(data)
+        with self.memory.lock:
+            if is_file:
+                size = resident_size(data)
+                self.memory.reserve(self, memory_path, size)
+            replaced = self._get_if_usage_tracked(path)
+            if not self._put(path, data):
+                return False
+            if is_file:
+                self.memory.stored(memory_path, size)
+            else:
+                self.memory.forget(memory_path)
+            self._update_usage(data, replaced)
+        self.notify("put", path)
+        return True
+
+    def _put(self, path, data):
         path, name = self._get_path_components(path)
         obj = self._find_object_for_path(path)
-        if isinstance(obj, dict):
+        if isinstance(obj, DirNode):
+            obj.children[name] = to_nodes(data)
+            return True
+        elif isinstance(obj, dict):
             obj[name] = data
             return True
         elif isinstance(obj, list) and name.isdigit():
@@ -31,9 +179,48 @@ class ContentProvider(object):
         return False
 
     def remove(self, path):
+        self._mark_changed(path)
+        with self.memory.lock:
+            removed = self._get_if_usage_tracked(path)
+            if not self._remove(path):
+                return False
+            self.memory.forget(_normalize_path(path))
+            self._update_usage(None, removed)
+        self.notify("remove", path)
+        return True
+
+    def rename(self, oldpath, newpath):
+        """
+        Move `oldpath` to `newpath` using `put()` and `remove()`.
+
+        The memory accounting of the moved paths moves along with them, so the content
+        isn't counted twice and can't be evicted to make room for itself.
+        """
+        content = self.get(oldpath)
+        if content is None:
+            return False
+        old_memory_path = _normalize_path(oldpath)
+        new_memory_path = _normalize_path(newpath)
+        with self.memory.lock:
+            moved = self.memory.detach(old_memory_path)
+            try:
+                stored = self.put(newpath, content)
+            except Exception:
+                self.memory.attach(old_memory_path, moved)
+                raise
+            if not stored:
+                self.memory.attach(old_memory_path, moved)
+                return False
+            self.memory.attach(new_memory_path, moved)
+            # If this fails both paths hold the content, only the new one is accounted for
+            return self.remove(oldpath)
+
+    def _remove(self, path):
         path, name = self._get_path_components(path)
         obj = self._find_object_for_path(path)
-        if isinstance(obj, dict):
+        if isinstance(obj, DirNode):
+            return obj.children.pop(name, None) is not None
+        elif isinstance(obj, dict):
             try:
                 del obj[name]
                 return True
@@ -56,7 +243,9 @@ class ContentProvider(object):
 
     def list(self, path):
         obj = self._find_object_for_path(path)
-        if isinstance(obj, dict):
+        if isinstance(obj, DirNode):
+            return obj.children.keys()
+        elif isinstance(obj, dict):
             return obj.keys()
         elif isinstance(obj, (list, tuple)):
             return [str(i) for i in range(len(obj))]
@@ -64,7 +253,79 @@ class ContentProvider(object):
             return [n for n in dir(obj) if not n.startswith("__")]
 
     def is_dir(self, path):
-        return not isinstance(self.get(path), string_types + integer_types)
+        return self._is_dir_object(self.get(path))
+
+    def touch(self, path):
+        """Mark `path` as accessed for the eviction order of the memory accounting."""
+        self.memory.touch(_normalize_path(path))
+
+    def begin_write(self, path):
+        """Protect `path` from eviction while a client writes to it."""
+        self.memory.begin_write(_normalize_path(path))
+
+    def end_write(self, path):
+        self.memory.end_write(_normalize_path(path))
+
+    def walk(self, path="/"):
+        """
+        Yield ``(path, obj)`` for `path` and everything below it. `obj` is None for dirs.
+
+        Only dicts, lists, tuples and `DirNode` are treated as directories, anything else
+        is yielded as a file.
+        """
+        obj = self.get(path)
+        if obj is None:
+            return
+        for item in self._walk_object(path, obj):
+            yield item
+
+    @classmethod
+    def _walk_object(cls, path, obj):
+        if isinstance(obj, DirNode):
+            children = iteritems(obj.children)
+        elif isinstance(obj, dict):
+            children = iteritems(obj)
+        elif isinstance(obj, (list, tuple)):
+            children = ((str(i), child) for i, child in enumerate(obj))
+        else:
+            yield path, obj
+            return
+        yield path, None
+        for name, child in children:
+            if isinstance(name, binary_type):
+                name = name.decode()
+            if callable(child):
+                child = child()
+            for item in cls._walk_object(posixpath.join(path, name), child):
+                yield item
+
+    @classmethod
+    def _object_usage(cls, obj):
+        if obj is None:
+            return 0
+        return sum(resident_size(o) for _, o in cls._walk_object("/", obj) if o is not None)
+
+    def get_usage(self, path="/"):
+        """
+        Return the number of content bytes held in memory for `path` and below.
+
+        The total for ``"/"`` is kept up to date by `put()` and `remove()` instead of being
+        recomputed on every call. Changes made to the content object directly aren't
+        reflected until the content object is set again.
+        """
+        if _normalize_path(path) != "/":
+            return self._object_usage(self.get(path))
+        with self.memory.lock:
+            if self._usage is None:
+                self._usage = self._object_usage(self.content_object)
+            return self._usage
+
+    def _get_if_usage_tracked(self, path):
+        return None if self._usage is None else self.get(path)
+
+    def _update_usage(self, added, removed):
+        if self._usage is not None:
+            self._usage += self._object_usage(added) - self._object_usage(removed)
 
     def get_size(self, path):
         try:
@@ -72,8 +333,14 @@ class ContentProvider(object):
         except TypeError:
             return len(str(self.get(path)))
 
+    @staticmethod
+    def _is_dir_object(obj):
+        if isinstance(obj, Node):
+            return obj.is_dir
+        return not isinstance(obj, _FILE_TYPES)
+
     def _find_object_for_path(self, path):
-        if not self.content_object:
+        if self.content_object is None:
             return None
 
         if isinstance(path, binary_type):
@@ -84,6 +351,11 @@ class ContentProvider(object):
         obj = self.content_object
         for part in path.split(separator):
             if part:
+                if isinstance(obj, DirNode):
+                    obj = obj.children.get(part)
+                    if obj is None:
+                        return None
+                    continue
                 try:
                     new_obj = getattr(obj, part)
                 except (AttributeError, TypeError):
@@ -109,3 +381,19 @@ class ContentProvider(object):
             separator = "/"
         path, _, name = path.rpartition(separator)
         return path, name
+
+
+class CompactContentProvider(ContentProvider):
+    """
+    Stores content as `DirNode` trees.
+
+    Assigned content objects are converted once, so file content is held as ``bytes`` and
+    directory checks don't need to walk the type hierarchy.
+    """
+
+    @ContentProvider.content_object.setter
+    def content_object(self, content_object):
+        ContentProvider.content_object.fset(self, to_nodes(content_object))
+
+    def to_plain(self):
+        return from_nodes(self.content_object)
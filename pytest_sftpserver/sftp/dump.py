@@ -0,0 +1,214 @@
+# encoding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import os
+import posixpath
+import tarfile
+import time
+
+from six import binary_type, integer_types, text_type
+
+CHUNK_SIZE = 1024 * 1024
+
+_TAR_MODES = (
+    (".tar", ""),
+    (".tar.gz", "gz"),
+    (".tgz", "gz"),
+    (".tar.bz2", "bz2"),
+    (".tar.xz", "xz"),
+)
+
+
+def _tar_compression(target):
+    for suffix, compression in _TAR_MODES:
+        if target.endswith(suffix):
+            return compression
+    return None
+
+
+def _to_text(path):
+    if isinstance(path, binary_type):
+        return path.decode()
+    return path
+
+
+def _as_sliceable(obj):
+    if isinstance(obj, text_type):
+        return obj.encode()
+    if isinstance(obj, integer_types):
+        return str(obj).encode()
+    return obj
+
+
+def _is_file_content(obj):
+    """Check whether `obj` can be served (and therefore dumped) as file content."""
+    obj = _as_sliceable(obj)
+    return hasattr(obj, "__len__") and hasattr(obj, "__getitem__")
+
+
+def _iter_chunks(obj):
+    obj = _as_sliceable(obj)
+    for offset in range(0, len(obj), CHUNK_SIZE):
+        yield obj[offset : offset + CHUNK_SIZE]
+
+
+class _ChunkReader(object):
+    """File-like object over a content node that doesn't require it to be in one piece."""
+
+    def __init__(self, obj):
+        self._chunks = _iter_chunks(obj)
+        self._chunk = b""
+        self._pos = 0
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self._pos >= len(self._chunk):
+                self._chunk = next(self._chunks, b"")
+                self._pos = 0
+                if not self._chunk:
+                    break
+            end = len(self._chunk) if size < 0 else min(len(self._chunk), self._pos + size)
+            parts.append(self._chunk[self._pos : end])
+            if size > 0:
+                size -= end - self._pos
+            self._pos = end
+        return b"".join(parts)
+
+
+def _minimal_paths(paths):
+    """Drop every path that is contained in another path of `paths`."""
+    result = []
+    for path in sorted(posixpath.normpath(posixpath.join("/", _to_text(p))) for p in paths):
+        if result and (path == result[-1] or path.startswith(result[-1].rstrip("/") + "/")):
+            continue
+        result.append(path)
+    return result
+
+
+def _local_path(target, path):
+    return os.path.join(target, *[part for part in path.split("/") if part])
+
+
+def _owned_below(manifest, path):
+    """Return the manifest entries at or below `path`, deepest first."""
+    prefix = path.rstrip("/") + "/"
+    return sorted((p for p in manifest if p == path or p.startswith(prefix)), reverse=True)
+
+
+def _remove_owned(target, path, manifest):
+    """Remove what previous dumps wrote at or below `path`, keeping everything else."""
+    for owned_path in _owned_below(manifest, path):
+        local_path = _local_path(target, owned_path)
+        if manifest.pop(owned_path):
+            try:
+                os.rmdir(local_path)
+            except OSError:
+                # Gone already or holds files that weren't written by a dump
+                pass
+        elif os.path.lexists(local_path) and not os.path.isdir(local_path):
+            os.remove(local_path)
+
+
+def _dump_to_directory(content_provider, target, paths, manifest):
+    written = []
+    for path in paths:
+        if content_provider.get(path) is None:
+            _remove_owned(target, path, manifest)
+            continue
+        for item_path, obj in content_provider.walk(path):
+            local_path = _local_path(target, item_path)
+            if obj is not None and not _is_file_content(obj):
+                continue
+            if obj is None:
+                if manifest.get(item_path) is False:
+                    _remove_owned(target, item_path, manifest)
+                if not os.path.isdir(local_path):
+                    os.makedirs(local_path)
+                    if item_path != "/":
+                        manifest[item_path] = True
+                names = set(_to_text(name) for name in content_provider.list(item_path))
+                for name in os.listdir(local_path):
+                    if name not in names:
+                        _remove_owned(target, posixpath.join(item_path, name), manifest)
+            else:
+                if manifest.get(item_path):
+                    _remove_owned(target, item_path, manifest)
+                with open(local_path, "wb") as f:
+                    for chunk in _iter_chunks(obj):
+                        f.write(chunk)
+                manifest[item_path] = False
+                written.append(item_path)
+    return written
+
+
+def _needs_rewrite(content_provider, paths, manifest):
+    """Check whether appending `paths` would leave removed or replaced entries behind."""
+    for path in paths:
+        if content_provider.get(path) is None:
+            return True
+        for owned_path in _owned_below(manifest, path):
+            if content_provider.get(owned_path) is None:
+                return True
+            if content_provider.is_dir(owned_path) != manifest[owned_path]:
+                return True
+    return False
+
+
+def _dump_to_tar(content_provider, target, paths, compression, manifest, append):
+    written = []
+    mode = "a" if append else "w:" + compression
+    if not append:
+        manifest.clear()
+    now = time.time()
+    with tarfile.open(target, mode) as tar:
+        for path in paths:
+            for item_path, obj in content_provider.walk(path):
+                if obj is not None and not _is_file_content(obj):
+                    continue
+                info = tarfile.TarInfo(item_path.lstrip("/") or ".")
+                info.mtime = now
+                manifest[item_path] = obj is None
+                if obj is None:
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    tar.addfile(info)
+                else:
+                    info.size = len(_as_sliceable(obj))
+                    info.mode = 0o644
+                    tar.addfile(info, _ChunkReader(obj))
+                    written.append(item_path)
+    return written
+
+
+def dump(content_provider, target, paths=None, manifest=None):
+    """
+    Write the content of `content_provider` to `target` and return the written file paths.
+
+    `target` is a directory or, if it ends with one of the ``.tar``, ``.tar.gz``, ``.tgz``,
+    ``.tar.bz2`` or ``.tar.xz`` suffixes, a tar archive. File content is written in chunks
+    so it never has to be copied as a whole.
+
+    `manifest` is a dict of the paths previous dumps wrote to `target` (mapped to whether
+    they are directories) and is updated in place. Only those paths are ever removed from
+    a directory target, other files in it are left alone.
+
+    If `paths` is given only those paths (and everything below them) are written. Paths
+    that no longer exist are removed from a directory target. Uncompressed tar archives
+    get the paths appended unless that would leave removed entries in the archive.
+    Compressed archives can't be appended to and are always written completely.
+    """
+    target = str(target)
+    manifest = {} if manifest is None else manifest
+    compression = _tar_compression(target)
+    if compression is None:
+        if not os.path.isdir(target):
+            os.makedirs(target)
+        paths = ["/"] if paths is None else _minimal_paths(paths)
+        return _dump_to_directory(content_provider, target, paths, manifest)
+    if paths is not None and not compression and os.path.exists(target):
+        paths = _minimal_paths(paths)
+        if not _needs_rewrite(content_provider, paths, manifest):
+            return _dump_to_tar(content_provider, target, paths, "", manifest, append=True)
+    paths = [] if content_provider.get("/") is None else ["/"]
+    return _dump_to_tar(content_provider, target, paths, compression, manifest, append=False)
@@ -12,21 +12,37 @@ from paramiko.sftp import SFTP_FAILURE, SFTP_NO_SUCH_FILE, SFTP_OK
 from paramiko.sftp_attr import SFTPAttributes
 from paramiko.sftp_handle import SFTPHandle
 from paramiko.sftp_si import SFTPServerInterface
-from six import string_types, text_type
+from six import binary_type, string_types, text_type
 
+from pytest_sftpserver.sftp.memory import QuotaExceededError
 from pytest_sftpserver.sftp.util import abspath
 
 
+def _call_hook(content_provider, name, *args):
+    """Call an optional `ContentProvider` method that custom providers may not have."""
+    hook = getattr(content_provider, name, None)
+    if hook is not None:
+        hook(*args)
+
+
 class VirtualSFTPHandle(SFTPHandle):
     def __init__(self, path, content_provider, flags=0):
         super(VirtualSFTPHandle, self).__init__()
         self.path = path
         self.content_provider = content_provider
+        self._written = False
+        self._writing = False
         if self.content_provider.get(self.path) is None and flags and flags & O_CREAT == O_CREAT:
             # Create new empty "file"
-            self.content_provider.put(path, "")
+            self._written = self.content_provider.put(path, "")
 
     def close(self):
+        if self._writing:
+            self._writing = False
+            _call_hook(self.content_provider, "end_write", self.path)
+        if self._written:
+            self._written = False
+            _call_hook(self.content_provider, "notify", "close", self.path)
         return SFTP_OK
 
     def chattr(self, attr):
@@ -36,12 +52,28 @@ class VirtualSFTPHandle(SFTPHandle):
         return SFTP_OK
 
     def write(self, offset, data):
+        if not self._writing:
+            # Keep the file from being evicted until the handle is closed
+            self._writing = True
+            _call_hook(self.content_provider, "begin_write", self.path)
+        try:
+            return self._write(offset, data)
+        except QuotaExceededError:
+            return SFTP_FAILURE
+
+    def _write(self, offset, data):
         content = self.content_provider.get(self.path)
 
         if content is None:
-            return SFTP_OK if self.content_provider.put(self.path, data) else SFTP_NO_SUCH_FILE
-
-        if not isinstance(content, string_types):
+            if offset > 0:
+                # The file was removed while being written to, don't recreate it partially
+                return SFTP_FAILURE
+            if not self.content_provider.put(self.path, data):
+                return SFTP_NO_SUCH_FILE
+            self._notify_write()
+            return SFTP_OK
+
+        if not isinstance(content, string_types + (binary_type,)):
             # Can't offset write into a 'directory' or integer
             return SFTP_FAILURE
 
@@ -52,12 +84,20 @@ class VirtualSFTPHandle(SFTPHandle):
             content = content + b"\x00" * (offset - len(content))
 
         content = content[:offset] + data + content[offset + len(data) :]
-        return SFTP_OK if self.content_provider.put(self.path, content) else SFTP_FAILURE
+        if not self.content_provider.put(self.path, content):
+            return SFTP_FAILURE
+        self._notify_write()
+        return SFTP_OK
+
+    def _notify_write(self):
+        self._written = True
+        _call_hook(self.content_provider, "notify", "write", self.path)
 
     def read(self, offset, length):
         if self.content_provider.get(self.path) is None:
             return SFTP_NO_SUCH_FILE
 
+        _call_hook(self.content_provider, "touch", self.path)
         end = offset + length
         return self.content_provider.get(self.path)[offset:end]
 
@@ -108,9 +148,15 @@ class VirtualSFTPServerInterface(SFTPServerInterface):
         content = self.content_provider.get(oldpath)
         if not content:
             return SFTP_NO_SUCH_FILE
-        res = self.content_provider.put(newpath, content)
-        if res:
-            res = res and self.content_provider.remove(oldpath)
+        rename = getattr(self.content_provider, "rename", None)
+        try:
+            if rename is not None:
+                res = rename(oldpath, newpath)
+            else:
+                res = self.content_provider.put(newpath, content)
+                res = res and self.content_provider.remove(oldpath)
+        except QuotaExceededError:
+            return SFTP_FAILURE
         return SFTP_OK if res else SFTP_FAILURE
 
     @abspath
@@ -0,0 +1,79 @@
+# encoding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import socket
+
+from six import string_types
+
+DEFAULT_ADDRESS = ("127.0.0.1", 0)
+
+
+def address_family(address):
+    """Return the socket family for a ``(host, port)`` tuple or a unix socket path."""
+    if isinstance(address, string_types):
+        return socket.AF_UNIX
+    if ":" in address[0]:
+        return socket.AF_INET6
+    return socket.AF_INET
+
+
+def parse_address(value):
+    """
+    Parse a listen address given as text.
+
+    Accepts ``unix:<path>``, ``[<ipv6 host>]:<port>`` and ``<host>:<port>``.
+    """
+    if value.startswith("unix:"):
+        return value[len("unix:") :]
+    host, sep, port = value.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError("Invalid listen address {!r}".format(value))
+    if host.startswith("[") and host.endswith("]"):
+        host = host[1:-1]
+    return host, int(port)
+
+
+class Listener(object):
+    """Connection details of one address the server listens on."""
+
+    def __init__(self, family, address):
+        self.family = family
+        self.address = address
+
+    def __repr__(self):
+        return "<Listener {!r}>".format(self.address)
+
+    @property
+    def host(self):
+        if self.family == getattr(socket, "AF_UNIX", None):
+            return None
+        return self.address[0]
+
+    @property
+    def port(self):
+        if self.family == getattr(socket, "AF_UNIX", None):
+            return None
+        return self.address[1]
+
+    @property
+    def path(self):
+        if self.family == getattr(socket, "AF_UNIX", None):
+            return self.address
+        return None
+
+    @property
+    def url(self):
+        if self.host is None:
+            return None
+        host = "[{}]".format(self.host) if self.family == socket.AF_INET6 else self.host
+        return "sftp://user:pw@{}:{}/".format(host, self.port)
+
+    def connect(self):
+        """Return a socket connected to this listener, e.g. for ``paramiko.Transport``."""
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.address)
+        except Exception:
+            sock.close()
+            raise
+        return sock
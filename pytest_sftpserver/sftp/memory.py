@@ -0,0 +1,160 @@
+# encoding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import errno
+from collections import OrderedDict
+from threading import RLock
+
+from six import binary_type, integer_types, text_type
+
+POLICIES = ("reject", "evict")
+
+
+class QuotaExceededError(IOError):
+    def __init__(self, path, size, limit):
+        super(QuotaExceededError, self).__init__(
+            errno.ENOSPC,
+            "Storing {} bytes at {} exceeds the memory limit of {} bytes".format(
+                size, path, limit
+            ),
+        )
+        self.path = path
+        self.size = size
+        self.limit = limit
+
+    def __reduce__(self):
+        # Needed to transfer the error from a server process
+        return type(self), (self.path, self.size, self.limit)
+
+
+def resident_size(obj):
+    """Return the number of content bytes `obj` keeps in memory (excluding children)."""
+    if isinstance(obj, (text_type, binary_type)):
+        return len(obj)
+    if isinstance(obj, integer_types):
+        return len(str(obj))
+    # Directories and generated or lazily loaded files
+    return 0
+
+
+class MemoryAccounting(object):
+    """
+    Tracks the size of everything stored through `ContentProvider.put()`.
+
+    If `limit` is set and storing data would exceed it, the `"reject"` policy raises
+    `QuotaExceededError` while the `"evict"` policy first removes the least recently
+    accessed stored paths, calling ``on_evict(path, size)`` for each of them.
+    """
+
+    def __init__(self, limit=None, policy="reject", on_evict=None):
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of {}".format(", ".join(POLICIES)))
+        self.limit = limit
+        self.policy = policy
+        self.on_evict = on_evict
+        self.stored_bytes = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.rejected_writes = 0
+        # path -> size, least recently accessed first
+        self._stored = OrderedDict()
+        # path -> number of open handles writing to it, these aren't evicted
+        self._writing = {}
+        # Accounting of outer content objects while `serve_content()` blocks are active
+        self._saved = []
+        # Held while data is being stored so that concurrent writes can't exceed the limit
+        self.lock = RLock()
+
+    def reserve(self, content_provider, path, size):
+        """Make room for storing `size` bytes at `path` or raise `QuotaExceededError`."""
+        with self.lock:
+            if self.limit is None:
+                return
+            required = self.stored_bytes - self._stored.get(path, 0) + size
+            if required > self.limit and self.policy == "evict":
+                for evict_path in list(self._stored):
+                    if required <= self.limit:
+                        break
+                    if evict_path == path or evict_path in self._writing:
+                        continue
+                    evict_size = self._stored[evict_path]
+                    content_provider.remove(evict_path)
+                    self.forget(evict_path)
+                    required -= evict_size
+                    self.evicted_files += 1
+                    self.evicted_bytes += evict_size
+                    if self.on_evict is not None:
+                        self.on_evict(evict_path, evict_size)
+            if required > self.limit:
+                self.rejected_writes += 1
+                raise QuotaExceededError(path, size, self.limit)
+
+    def stored(self, path, size):
+        with self.lock:
+            self.stored_bytes += size - self._stored.pop(path, 0)
+            self._stored[path] = size
+
+    def touch(self, path):
+        with self.lock:
+            if path in self._stored:
+                self._stored[path] = self._stored.pop(path)
+
+    def forget(self, path):
+        """Stop tracking `path` and everything below it."""
+        with self.lock:
+            prefix = path.rstrip("/") + "/"
+            for stored_path in [p for p in self._stored if p == path or p.startswith(prefix)]:
+                self.stored_bytes -= self._stored.pop(stored_path)
+
+    def detach(self, path):
+        """
+        Stop tracking `path` and everything below it and return the entries for `attach()`.
+        """
+        with self.lock:
+            prefix = path.rstrip("/") + "/"
+            entries = []
+            for stored_path in [p for p in self._stored if p == path or p.startswith(prefix)]:
+                size = self._stored.pop(stored_path)
+                self.stored_bytes -= size
+                entries.append((stored_path[len(path.rstrip("/")) :], size))
+            return entries
+
+    def attach(self, path, entries):
+        """Track the entries returned by `detach()` below `path`."""
+        with self.lock:
+            for suffix, size in entries:
+                self.stored(path.rstrip("/") + suffix if suffix else path, size)
+
+    def begin_write(self, path):
+        with self.lock:
+            self._writing[path] = self._writing.get(path, 0) + 1
+
+    def end_write(self, path):
+        with self.lock:
+            count = self._writing.pop(path, 0) - 1
+            if count > 0:
+                self._writing[path] = count
+
+    def reset(self):
+        with self.lock:
+            self._stored.clear()
+            self.stored_bytes = self._saved[-1][1] if self._saved else 0
+
+    def push(self):
+        """
+        Start accounting for a temporarily served content object.
+
+        The data stored so far stays counted against the limit but can't be evicted until
+        `pop()` restores it.
+        """
+        with self.lock:
+            self._saved.append((self._stored, self.stored_bytes))
+            self._stored = OrderedDict()
+
+    def pop(self):
+        with self.lock:
+            self._stored, self.stored_bytes = self._saved.pop()
+
+    @property
+    def stored_files(self):
+        return len(self._stored)
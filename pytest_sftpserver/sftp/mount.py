@@ -0,0 +1,331 @@
+# encoding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import os
+import tarfile
+import zipfile
+from collections import OrderedDict
+from threading import Lock
+
+from pytest_sftpserver.sftp.nodes import DirNode, Node
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+
+class _LRUCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            if key in self._items:
+                value = self._items.pop(key)
+                self._items[key] = value
+                return value
+        # Loading can be slow, don't block reads of cached members meanwhile
+        value = load()
+        if len(value) > self.max_size:
+            return value
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = value
+                self.size += len(value)
+            while self.size > self.max_size:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+        return value
+
+
+class _Source(object):
+    """Base class for the backing store of a mount. Opened lazily and picklable."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._handle = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_handle"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def _get_handle(self):
+        if self._handle is None:
+            self._handle = self._open()
+        return self._handle
+
+    def _open(self):
+        raise NotImplementedError()
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def entries(self):
+        """Yield ``(name, size)`` for files and ``(name, None)`` for directories."""
+        raise NotImplementedError()
+
+    def read(self, key, offset, length):
+        raise NotImplementedError()
+
+
+class _DirectorySource(_Source):
+    def _open(self):
+        return None
+
+    def entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            relpath = os.path.relpath(dirpath, self.path)
+            for dirname in dirnames:
+                yield os.path.join(relpath, dirname), None
+            for filename in filenames:
+                name = os.path.join(relpath, filename)
+                yield name, os.path.getsize(os.path.join(dirpath, filename))
+
+    def read(self, key, offset, length):
+        with open(os.path.join(self.path, key), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+class _MemberStream(object):
+    """An open member of an archive that is read sequentially."""
+
+    def __init__(self, archive, member):
+        self._archive = archive
+        self._member = member
+        self.pos = 0
+
+    def read(self, length):
+        data = self._member.read(length)
+        self.pos += len(data)
+        return data
+
+    def close(self):
+        self._member.close()
+        self._archive.close()
+
+
+class _CachingSource(_Source):
+    """
+    A source whose members have to be decompressed before reading.
+
+    Members that fit into the cache are decompressed as a whole and cached. Larger
+    members are streamed from an open handle so that sequential reads only decompress
+    them once.
+    """
+
+    # Number of open handles for members too large for the cache
+    max_streams = 4
+
+    def __init__(self, path, cache_size):
+        super(_CachingSource, self).__init__(path)
+        self.cache_size = cache_size
+        self._cache = _LRUCache(cache_size)
+        self._sizes = {}
+        self._streams = OrderedDict()
+        self._stream_lock = Lock()
+
+    def __getstate__(self):
+        state = super(_CachingSource, self).__getstate__()
+        state["_cache"] = None
+        state["_streams"] = None
+        state["_stream_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        super(_CachingSource, self).__setstate__(state)
+        self._cache = _LRUCache(self.cache_size)
+        self._streams = OrderedDict()
+        self._stream_lock = Lock()
+
+    def close(self):
+        super(_CachingSource, self).close()
+        with self._stream_lock:
+            for stream in self._streams.values():
+                stream.close()
+            self._streams.clear()
+
+    def read(self, key, offset, length):
+        if self._sizes.get(key, 0) > self.cache_size:
+            return self._read_stream(key, offset, length)
+        data = self._cache.get(key, lambda: self._read_member(key))
+        return data[offset : offset + length]
+
+    def _read_stream(self, key, offset, length):
+        with self._stream_lock:
+            stream = self._streams.pop(key, None)
+            if stream is not None and stream.pos > offset:
+                # Can't seek backwards in a decompressed stream
+                stream.close()
+                stream = None
+            if stream is None:
+                stream = self._open_member(key)
+            self._streams[key] = stream
+            while len(self._streams) > self.max_streams:
+                _, evicted = self._streams.popitem(last=False)
+                evicted.close()
+            while stream.pos < offset:
+                if not stream.read(min(offset - stream.pos, 1024 * 1024)):
+                    return b""
+            return stream.read(length)
+
+    def _read_member(self, key):
+        raise NotImplementedError()
+
+    def _open_member(self, key):
+        """Return a `_MemberStream` for `key`, using its own archive handle."""
+        raise NotImplementedError()
+
+
+class _ZipSource(_CachingSource):
+    def _open(self):
+        return zipfile.ZipFile(self.path)
+
+    def entries(self):
+        with self._lock:
+            infos = self._get_handle().infolist()
+        for info in infos:
+            if info.filename.endswith("/"):
+                yield info.filename, None
+            else:
+                self._sizes[info.filename] = info.file_size
+                yield info.filename, info.file_size
+
+    def _read_member(self, key):
+        with self._lock:
+            return self._get_handle().read(key)
+
+    def _open_member(self, key):
+        archive = zipfile.ZipFile(self.path)
+        return _MemberStream(archive, archive.open(key))
+
+
+class _TarSource(_CachingSource):
+    def __init__(self, path, cache_size):
+        super(_TarSource, self).__init__(path, cache_size)
+        # Members of uncompressed archives can be read in place without caching
+        try:
+            tarfile.open(path, "r:").close()
+            self.compressed = False
+        except tarfile.ReadError:
+            self.compressed = True
+        self._members = {}
+
+    def _open(self):
+        if self.compressed:
+            return tarfile.open(self.path)
+        return open(self.path, "rb")
+
+    def entries(self):
+        with tarfile.open(self.path) as tar:
+            for member in tar:
+                if member.isdir():
+                    yield member.name, None
+                elif member.isfile():
+                    self._members[member.name] = member
+                    self._sizes[member.name] = member.size
+                    yield member.name, member.size
+
+    def read(self, key, offset, length):
+        if self.compressed:
+            return super(_TarSource, self).read(key, offset, length)
+        with self._lock:
+            handle = self._get_handle()
+            handle.seek(self._members[key].offset_data + offset)
+            return handle.read(length)
+
+    def _read_member(self, key):
+        with self._lock:
+            return self._get_handle().extractfile(self._members[key]).read()
+
+    def _open_member(self, key):
+        archive = tarfile.open(self.path)
+        return _MemberStream(archive, archive.extractfile(self._members[key]))
+
+
+class LazyFile(Node):
+    """A file whose content is read from a mount's source only when it is accessed."""
+
+    __slots__ = ("source", "key", "size")
+
+    def __init__(self, source, key, size):
+        self.source = source
+        self.key = key
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError("LazyFile only supports slicing")
+        start, stop, _ = item.indices(self.size)
+        if stop <= start:
+            return b""
+        return self.source.read(self.key, start, stop - start)
+
+    def __repr__(self):
+        return "<LazyFile {!r} size={}>".format(self.key, self.size)
+
+
+class MountNode(DirNode):
+    """The root directory of a mount. Holds the source that its `LazyFile`s read from."""
+
+    __slots__ = ("source",)
+
+    def __init__(self, source, children=None):
+        super(MountNode, self).__init__(children)
+        self.source = source
+
+    def close(self):
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def mount(path, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Return a directory node that serves the content of the directory, zip or tar archive
+    at `path`.
+
+    Only the archive's index is read up front; files are read (and decompressed) when a
+    client reads them. Decompressed members are kept in an LRU cache of at most
+    `cache_size` bytes. Mounted files are read-only.
+    """
+    if os.path.isdir(path):
+        source = _DirectorySource(path)
+    elif zipfile.is_zipfile(path):
+        source = _ZipSource(path, cache_size)
+    elif tarfile.is_tarfile(path):
+        source = _TarSource(path, cache_size)
+    else:
+        raise ValueError("Can't mount {!r}: not a directory, zip or tar archive".format(path))
+
+    root = MountNode(source)
+    for key, size in source.entries():
+        parts = [part for part in key.replace(os.sep, "/").split("/") if part not in ("", ".")]
+        if not parts:
+            continue
+        node = root
+        for part in parts[:-1]:
+            node = node.children.setdefault(part, DirNode())
+        if size is None:
+            node.children.setdefault(parts[-1], DirNode())
+        else:
+            node.children[parts[-1]] = LazyFile(source, key, size)
+    return root
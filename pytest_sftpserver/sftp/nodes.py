@@ -0,0 +1,67 @@
+# encoding: utf-8
+from __future__ import absolute_import, division, print_function
+
+from six import integer_types, iteritems, text_type
+
+
+class Node(object):
+    """Base class for content tree nodes that know whether they represent a directory."""
+
+    __slots__ = ()
+    is_dir = False
+
+
+class DirNode(Node):
+    """A directory mapping names to child nodes."""
+
+    __slots__ = ("children",)
+    is_dir = True
+
+    def __init__(self, children=None):
+        self.children = {} if children is None else children
+
+    def __len__(self):
+        return len(self.children)
+
+    def __getitem__(self, name):
+        return self.children[name]
+
+    def __eq__(self, other):
+        if isinstance(other, DirNode):
+            return self.children == other.children
+        return NotImplemented
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "DirNode({!r})".format(self.children)
+
+
+def to_nodes(obj):
+    """
+    Convert a tree of dicts, lists and strings into `DirNode` instances holding ``bytes``.
+
+    Lists and tuples become directories keyed by the item index. Text and integers are
+    encoded to ``bytes``. Existing nodes and any other objects are returned unchanged.
+    """
+    if isinstance(obj, Node):
+        return obj
+    if isinstance(obj, dict):
+        return DirNode({name: to_nodes(child) for name, child in iteritems(obj)})
+    if isinstance(obj, (list, tuple)):
+        return DirNode({str(i): to_nodes(child) for i, child in enumerate(obj)})
+    if isinstance(obj, text_type):
+        return obj.encode()
+    if isinstance(obj, integer_types):
+        return str(obj).encode()
+    return obj
+
+
+def from_nodes(obj):
+    """Convert a tree of `DirNode` instances back into dicts."""
+    if isinstance(obj, DirNode):
+        return {name: from_nodes(child) for name, child in iteritems(obj.children)}
+    return obj
@@ -0,0 +1,269 @@
+# encoding: utf-8
+from __future__ import absolute_import, division, print_function
+
+from contextlib import contextmanager
+from multiprocessing import Pipe, Process
+from threading import Lock, Thread
+from timeit import default_timer
+
+from pytest_sftpserver.sftp.content_provider import ContentProvider
+
+
+class _ServerTarget(object):
+    """Executes the commands sent by `SFTPServerProcess` inside the child process."""
+
+    def __init__(self, server, event_conn):
+        self.server = server
+        self._event_conn = event_conn
+        self._event_lock = Lock()
+        self._content_stack = []
+
+    def push_content(self, content_object):
+        context = self.server.serve_content(content_object)
+        context.__enter__()
+        self._content_stack.append(context)
+
+    def pop_content(self):
+        self._content_stack.pop().__exit__(None, None, None)
+
+    def forward_events(self, enabled):
+        if enabled:
+            self.server.subscribe(self._forward_event)
+        else:
+            self.server.unsubscribe(self._forward_event)
+
+    def _forward_event(self, event, path):
+        # Called from the server's connection threads
+        with self._event_lock:
+            self._event_conn.send((event, path))
+
+    def get_content_object(self):
+        return self.server.content_provider.content_object
+
+    def set_content_object(self, content_object):
+        self.server.content_provider.content_object = content_object
+
+    def dump(self, target, full):
+        return self.server.dump(target, full)
+
+    def metrics(self):
+        return self.server.metrics()
+
+    def provider_call(self, name, args):
+        result = getattr(self.server.content_provider, name)(*args)
+        if name == "list":
+            # dict key views can't be pickled
+            result = list(result)
+        return result
+
+
+def _serve(conn, event_conn, server_kwargs):
+    # Imported here so that the parent process doesn't need paramiko to spawn the child
+    from pytest_sftpserver.sftp.server import SFTPServer
+
+    try:
+        server = SFTPServer(**server_kwargs)
+        server.start()
+    except Exception as e:
+        conn.send((False, e))
+        return
+    conn.send((True, server.listeners))
+
+    target = _ServerTarget(server, event_conn)
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        if command == "stop":
+            break
+        try:
+            result = getattr(target, command)(*args)
+        except Exception as e:
+            conn.send((False, e))
+        else:
+            conn.send((True, result))
+
+    server.shutdown()
+    server.server_close()
+    event_conn.close()
+    conn.send((True, None))
+
+
+class _ContentProviderProxy(object):
+    def __init__(self, server_process):
+        self._server_process = server_process
+
+    @property
+    def content_object(self):
+        return self._server_process._call("get_content_object")
+
+    @content_object.setter
+    def content_object(self, content_object):
+        self._server_process._call("set_content_object", content_object)
+
+    def _provider_call(self, name, *args):
+        return self._server_process._call("provider_call", name, args)
+
+    def get(self, path):
+        return self._provider_call("get", path)
+
+    def put(self, path, data):
+        return self._provider_call("put", path, data)
+
+    def remove(self, path):
+        return self._provider_call("remove", path)
+
+    def rename(self, oldpath, newpath):
+        return self._provider_call("rename", oldpath, newpath)
+
+    def list(self, path):
+        return self._provider_call("list", path)
+
+    def is_dir(self, path):
+        return self._provider_call("is_dir", path)
+
+    def get_size(self, path):
+        return self._provider_call("get_size", path)
+
+    def get_usage(self, path="/"):
+        return self._provider_call("get_usage", path)
+
+    def mark(self):
+        return self._provider_call("mark")
+
+    def wait_for(self, path, timeout=None, event="close", since=None):
+        return self._provider_call("wait_for", path, timeout, event, since)
+
+
+class SFTPServerProcess(object):
+    """
+    Runs an `SFTPServer` in a child process.
+
+    Provides the same interface as `SFTPServer`. All content passed to the server (and
+    returned from it) has to be picklable since it is transferred between the processes.
+    The object passed to `serve_content()` is a copy in the child process and doesn't
+    reflect uploads, use `content_provider` to inspect the served content. Subscribed
+    callbacks are called from a thread of the parent process.
+    """
+
+    def __init__(self, content_object=None, content_provider_class=ContentProvider, **kwargs):
+        self._server_kwargs = dict(
+            kwargs, content_object=content_object, content_provider_class=content_provider_class
+        )
+        self._process = None
+        self._conn = None
+        self._lock = Lock()
+        self._subscribers = []
+        self._event_conn = None
+        self._event_thread = None
+        self.listeners = None
+        self.content_provider = _ContentProviderProxy(self)
+        self.startup_time = None
+        self.teardown_time = None
+
+    def start(self):
+        start = default_timer()
+        parent_conn, child_conn = Pipe()
+        event_reader, event_writer = Pipe(duplex=False)
+        self._process = Process(
+            target=_serve, args=(child_conn, event_writer, self._server_kwargs)
+        )
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+        event_writer.close()
+        self._conn = parent_conn
+        self._event_conn = event_reader
+        self.listeners = self._receive()
+        self.startup_time = default_timer() - start
+
+    def shutdown(self):
+        start = default_timer()
+        self._call("stop")
+        self._process.join()
+        self.teardown_time = default_timer() - start
+
+    def server_close(self):
+        if self._conn is not None:
+            self._conn.close()
+        if self._event_thread is None and self._event_conn is not None:
+            # Otherwise closed by the event thread once the child process is gone
+            self._event_conn.close()
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def _call(self, command, *args):
+        with self._lock:
+            self._conn.send((command, args))
+            return self._receive()
+
+    def _receive(self):
+        success, result = self._conn.recv()
+        if not success:
+            raise result
+        return result
+
+    @contextmanager
+    def serve_content(self, content_object):
+        self._call("push_content", content_object)
+        try:
+            yield
+        finally:
+            self._call("pop_content")
+
+    def mark(self):
+        return self.content_provider.mark()
+
+    def subscribe(self, callback, events=None):
+        """Call ``callback(event, path)`` for events in the server process."""
+        self._subscribers.append((callback, frozenset(events) if events else None))
+        if self._event_thread is None:
+            self._event_thread = Thread(target=self._dispatch_events)
+            self._event_thread.daemon = True
+            self._event_thread.start()
+            self._call("forward_events", True)
+
+    def unsubscribe(self, callback):
+        self._subscribers = [s for s in self._subscribers if s[0] is not callback]
+
+    def _dispatch_events(self):
+        while True:
+            try:
+                event, path = self._event_conn.recv()
+            except (EOFError, OSError):
+                break
+            for callback, events in self._subscribers:
+                if events is None or event in events:
+                    callback(event, path)
+        self._event_conn.close()
+
+    def wait_for(self, path, timeout=None, event="close", since=None):
+        # Blocks all other calls to the server process while waiting
+        return self.content_provider.wait_for(path, timeout, event, since)
+
+    def dump(self, target, full=False):
+        return self._call("dump", target, full)
+
+    def metrics(self):
+        return self._call("metrics")
+
+    @property
+    def server_address(self):
+        return self.listeners[0].address
+
+    @property
+    def port(self):
+        return self.listeners[0].port
+
+    @property
+    def host(self):
+        return self.listeners[0].host
+
+    @property
+    def url(self):
+        return self.listeners[0].url
+
+    def wait_for_bind(self, timeout=0.5):
+        return self.listeners is not None
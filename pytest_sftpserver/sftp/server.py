@@ -1,8 +1,12 @@
 # encoding: utf-8
 from __future__ import absolute_import, division, print_function
 
+import errno
+import os
+import socket
+import stat
 from contextlib import contextmanager
-from threading import Event, Thread
+from threading import Thread
 from time import sleep
 
 from paramiko import sftp_server
@@ -11,7 +15,10 @@ from paramiko.transport import Transport
 
 from pytest_sftpserver.consts import SERVER_KEY_PRIVATE
 from pytest_sftpserver.sftp.content_provider import ContentProvider
+from pytest_sftpserver.sftp.dump import dump
 from pytest_sftpserver.sftp.interface import AllowAllAuthHandler, VirtualSFTPServerInterface
+from pytest_sftpserver.sftp.listener import DEFAULT_ADDRESS, Listener, address_family
+from pytest_sftpserver.sftp.memory import MemoryAccounting
 
 try:
     from SocketServer import StreamRequestHandler, TCPServer, ThreadingMixIn
@@ -19,9 +26,45 @@ except ImportError:
     from socketserver import StreamRequestHandler, TCPServer, ThreadingMixIn
 
 
+# Ciphers and MACs that are cheapest to compute on most hardware, fastest first
+FAST_CIPHERS = ("aes128-gcm@openssh.com", "aes128-ctr", "aes256-gcm@openssh.com", "aes256-ctr")
+FAST_DIGESTS = ("hmac-sha2-256-etm@openssh.com", "hmac-sha2-256", "hmac-sha1")
+
+
+def _supported(name, preferred):
+    """Return the names in `preferred` that paramiko supports, at least one is required."""
+    if not preferred:
+        return None
+    # An unconnected transport is enough to ask for the available algorithms
+    sock = socket.socket()
+    try:
+        available = getattr(Transport(sock).get_security_options(), name)
+    finally:
+        sock.close()
+    supported = tuple(n for n in preferred if n in available)
+    if not supported:
+        raise ValueError("None of the {} {!r} are supported".format(name, tuple(preferred)))
+    return supported
+
+
 class SFTPRequestHandler(StreamRequestHandler):
+    _host_key = None
+
     def handle(self):
-        transport = Transport(self.request)
+        options = self.server.transport_options
+        transport_kwargs = {}
+        if options.get("window_size"):
+            transport_kwargs["default_window_size"] = options["window_size"]
+        if options.get("max_packet_size"):
+            transport_kwargs["default_max_packet_size"] = options["max_packet_size"]
+        transport = Transport(self.request, **transport_kwargs)
+        security_options = transport.get_security_options()
+        if options.get("ciphers"):
+            security_options.ciphers = options["ciphers"]
+        if options.get("digests"):
+            security_options.digests = options["digests"]
+        if options.get("compression") is not None:
+            transport.use_compression(options["compression"])
         transport.add_server_key(self.host_key)
         transport.set_subsystem_handler(
             "sftp",
@@ -40,50 +83,231 @@ class SFTPRequestHandler(StreamRequestHandler):
 
     @property
     def host_key(self):
-        return RSAKey.from_private_key_file(SERVER_KEY_PRIVATE)
+        # Parsing the key is comparatively slow, only do it once
+        if SFTPRequestHandler._host_key is None:
+            SFTPRequestHandler._host_key = RSAKey.from_private_key_file(SERVER_KEY_PRIVATE)
+        return SFTPRequestHandler._host_key
+
+
+def _is_stale_socket(path):
+    """Check whether `path` is a unix socket that nothing listens on anymore."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return False
+    except OSError:
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (OSError, socket.error) as e:
+        return e.errno == errno.ECONNREFUSED
+    finally:
+        sock.close()
+    return False
+
+
+class _ListenerMixin(object):
+    # Don't wait for connected clients in `server_close()`
+    block_on_close = False
+
+    def __init__(self, address):
+        # Also handles AF_UNIX and AF_INET6 addresses, see `UnixStreamServer`
+        self.address_family = address_family(address)
+        TCPServer.__init__(self, address, SFTPRequestHandler)
 
+    def server_bind(self):
+        self._socket_file = None
+        if self.address_family != getattr(socket, "AF_UNIX", None):
+            super(_ListenerMixin, self).server_bind()
+            return
+        if _is_stale_socket(self.server_address):
+            # Left over from a previous run
+            os.remove(self.server_address)
+        super(_ListenerMixin, self).server_bind()
+        st = os.stat(self.server_address)
+        self._socket_file = (st.st_dev, st.st_ino)
 
-class SFTPServer(Thread, ThreadingMixIn, TCPServer):
-    def __init__(self, content_object=None, content_provider_class=ContentProvider):
+    def server_close(self):
+        super(_ListenerMixin, self).server_close()
+        if getattr(self, "_socket_file", None) is None:
+            return
+        try:
+            st = os.stat(self.server_address)
+            # Another server may have taken over the path in the meantime
+            if (st.st_dev, st.st_ino) == self._socket_file:
+                os.remove(self.server_address)
+        except OSError:
+            pass
+        self._socket_file = None
+
+    @property
+    def listener(self):
+        return Listener(self.address_family, self.server_address)
+
+
+class _ExtraListener(_ListenerMixin, ThreadingMixIn, TCPServer):
+    """An additional address served by an `SFTPServer`."""
+
+    def __init__(self, address, sftp_server):
+        self.sftp_server = sftp_server
+        _ListenerMixin.__init__(self, address)
+
+    @property
+    def content_provider(self):
+        return self.sftp_server.content_provider
+
+    @property
+    def transport_options(self):
+        return self.sftp_server.transport_options
+
+
+class SFTPServer(Thread, _ListenerMixin, ThreadingMixIn, TCPServer):
+    # How often `serve_forever()` checks for shutdown requests, determines teardown time
+    poll_interval = 0.05
+
+    def __init__(
+        self,
+        content_object=None,
+        content_provider_class=ContentProvider,
+        addresses=None,
+        ciphers=None,
+        digests=None,
+        compression=None,
+        window_size=None,
+        max_packet_size=None,
+        memory_limit=None,
+        memory_policy="reject",
+        on_evict=None,
+    ):
+        """
+        `addresses` is a list of ``(host, port)`` tuples (IPv4 or IPv6) and unix socket
+        paths to listen on. All of them serve the same content. Defaults to a random port
+        on ``127.0.0.1``.
+
+        `ciphers` and `digests` restrict the algorithms offered to clients to the supported
+        ones among the given names (e.g. `FAST_CIPHERS` / `FAST_DIGESTS`). A `ValueError`
+        is raised if none of them is supported. `compression`
+        enables or disables zlib compression. `window_size` and `max_packet_size` set the
+        SSH channel flow control parameters. By default paramiko's defaults are used.
+
+        `memory_limit` caps the number of bytes stored through the server (e.g. uploads).
+        Exceeding it either fails the write (`memory_policy` ``"reject"``) or evicts the
+        least recently accessed stored files (``"evict"``), calling ``on_evict(path, size)``
+        for each of them.
+        """
         self.content_provider = content_provider_class(content_object)
-        TCPServer.__init__(self, ("127.0.0.1", 0), SFTPRequestHandler, False)
+        self.content_provider.memory = MemoryAccounting(memory_limit, memory_policy, on_evict)
+        self.transport_options = dict(
+            ciphers=_supported("ciphers", ciphers),
+            digests=_supported("digests", digests),
+            compression=compression,
+            window_size=window_size,
+            max_packet_size=max_packet_size,
+        )
+        addresses = list(addresses or [DEFAULT_ADDRESS])
+        # Bind right away so that host and port are available before the thread runs
+        _ListenerMixin.__init__(self, addresses[0])
+        try:
+            self._extra_listeners = [_ExtraListener(a, self) for a in addresses[1:]]
+        except Exception:
+            self.server_close()
+            raise
         Thread.__init__(self)
         self.daemon = True
-        self._bound = Event()
+        self._last_dump_target = None
+        # Paths written by previous dumps per target, see `dump()`
+        self._dump_manifests = {}
 
     def run(self):
-        self.server_bind()
-        self.server_activate()
-        self._bound.set()
-        self.serve_forever()
+        for extra_listener in self._extra_listeners:
+            thread = Thread(target=extra_listener.serve_forever, args=(self.poll_interval,))
+            thread.daemon = True
+            thread.start()
+        self.serve_forever(self.poll_interval)
+
+    def shutdown(self):
+        for extra_listener in self._extra_listeners:
+            extra_listener.shutdown()
+        TCPServer.shutdown(self)
+
+    def server_close(self):
+        _ListenerMixin.server_close(self)
+        for extra_listener in getattr(self, "_extra_listeners", []):
+            extra_listener.server_close()
+
+    @property
+    def listeners(self):
+        return [self.listener] + [extra.listener for extra in self._extra_listeners]
 
     @contextmanager
     def serve_content(self, content_object):
         old_content_object = self.content_provider.content_object
+        # Keep the accounting of data stored in the outer content object
+        self.content_provider.memory.push()
 
         try:
             self.content_provider.content_object = content_object
             yield
         finally:
             self.content_provider.content_object = old_content_object
+            self.content_provider.memory.pop()
+
+    def mark(self):
+        """Return a token for `wait_for()`, see `ContentProvider.mark()`."""
+        return self.content_provider.mark()
+
+    def wait_for(self, path, timeout=None, event="close", since=None):
+        """Wait until `event` happened for `path`, see `ContentProvider.wait_for()`."""
+        return self.content_provider.wait_for(path, timeout, event, since)
+
+    def subscribe(self, callback, events=None):
+        self.content_provider.subscribe(callback, events)
+
+    def unsubscribe(self, callback):
+        self.content_provider.unsubscribe(callback)
+
+    def metrics(self):
+        """Return memory accounting figures of the served content."""
+        memory = self.content_provider.memory
+        return dict(
+            total_bytes=self.content_provider.get_usage(),
+            stored_bytes=memory.stored_bytes,
+            stored_files=memory.stored_files,
+            memory_limit=memory.limit,
+            evicted_files=memory.evicted_files,
+            evicted_bytes=memory.evicted_bytes,
+            rejected_writes=memory.rejected_writes,
+        )
+
+    def dump(self, target, full=False):
+        """
+        Write the served content to the directory or tar archive `target`.
+
+        Repeated dumps to the same target only write the paths that changed since the
+        previous dump unless `full` is given. Files in `target` that weren't written by a
+        dump are never removed. Returns the paths of the written files.
+        """
+        provider = self.content_provider
+        paths = provider.take_changed_paths()
+        target = os.path.abspath(str(target))
+        if full or target != self._last_dump_target:
+            paths = None
+        self._last_dump_target = target
+        manifest = self._dump_manifests.setdefault(target, {})
+        return dump(provider, target, paths, manifest)
 
     @property
     def port(self):
-        if not self.wait_for_bind():
-            return None
-        return self.server_address[1]
+        return self.listener.port
 
     @property
     def host(self):
-        if not self.wait_for_bind():
-            return None
-        return self.server_address[0]
+        return self.listener.host
 
     @property
     def url(self):
-        return "sftp://user:pw@{s.host}:{s.port}/".format(s=self)
+        return self.listener.url
 
     def wait_for_bind(self, timeout=0.5):
-        if self._bound.is_set():
-            return True
-        return self._bound.wait(timeout)
+        # The socket is bound in __init__, kept for backwards compatibility
+        return True
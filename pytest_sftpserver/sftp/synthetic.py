@@ -0,0 +1,127 @@
+# encoding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import random
+from binascii import unhexlify
+
+from six import text_type
+
+from pytest_sftpserver.sftp.nodes import Node
+
+
+def _random_bytes(key, length):
+    """Return `length` pseudo-random bytes determined by `key`."""
+    if hasattr(hashlib, "shake_128"):
+        return hashlib.shake_128(key).digest(length)
+    # Python < 3.6. Seeding with an int since str seeds hash differently across platforms.
+    seed = int(hashlib.sha512(key).hexdigest(), 16)
+    bits = random.Random(seed).getrandbits(length * 8)
+    return unhexlify("{:0{}x}".format(bits, length * 2))
+
+
+class SyntheticFile(Node):
+    """
+    Base class for file content that is generated on demand.
+
+    Only the requested slice is generated on each read, which allows serving files far
+    larger than available memory.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, size):
+        if size < 0:
+            raise ValueError("size must not be negative")
+        self.size = size
+        self._checksums = {}
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError("{} only supports slicing".format(type(self).__name__))
+        start, stop, step = item.indices(self.size)
+        if step != 1:
+            raise ValueError("{} doesn't support extended slices".format(type(self).__name__))
+        if stop <= start:
+            return b""
+        return self._generate(start, stop - start)
+
+    def __repr__(self):
+        return "<{} size={}>".format(type(self).__name__, self.size)
+
+    def _generate(self, offset, length):
+        raise NotImplementedError()
+
+    def iter_chunks(self, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        for offset in range(0, self.size, chunk_size):
+            yield self._generate(offset, min(chunk_size, self.size - offset))
+
+    def checksum(self, algorithm="md5"):
+        """Return the hex digest of the content. The result is cached per algorithm."""
+        if algorithm not in self._checksums:
+            digest = hashlib.new(algorithm)
+            for chunk in self.iter_chunks():
+                digest.update(chunk)
+            self._checksums[algorithm] = digest.hexdigest()
+        return self._checksums[algorithm]
+
+
+class ZeroFile(SyntheticFile):
+    """A sparse file of `size` zero bytes."""
+
+    def _generate(self, offset, length):
+        return b"\x00" * length
+
+
+class PatternFile(SyntheticFile):
+    """A file of `size` bytes consisting of `pattern` repeated."""
+
+    def __init__(self, pattern, size):
+        if isinstance(pattern, text_type):
+            pattern = pattern.encode()
+        if not pattern:
+            raise ValueError("pattern must not be empty")
+        super(PatternFile, self).__init__(size)
+        self.pattern = pattern
+
+    def _generate(self, offset, length):
+        pattern_length = len(self.pattern)
+        start = offset % pattern_length
+        repeats = (start + length) // pattern_length + 1
+        return (self.pattern * repeats)[start : start + length]
+
+
+class RandomFile(SyntheticFile):
+    """
+    A file of `size` pseudo-random bytes.
+
+    The content is determined by `seed` and is generated in independent blocks so that
+    any slice can be produced without generating the data before it.
+    """
+
+    block_size = 64 * 1024
+
+    def __init__(self, size, seed=0):
+        super(RandomFile, self).__init__(size)
+        self.seed = seed
+        self._last_block = (None, None)
+
+    def _block(self, index):
+        last_index, last_block = self._last_block
+        if last_index == index:
+            return last_block
+        length = min(self.block_size, self.size - index * self.block_size)
+        block = _random_bytes("{}:{}".format(self.seed, index).encode(), length)
+        self._last_block = (index, block)
+        return block
+
+    def _generate(self, offset, length):
+        first_block = offset // self.block_size
+        last_block = (offset + length - 1) // self.block_size
+        data = b"".join(self._block(i) for i in range(first_block, last_block + 1))
+        start = offset - first_block * self.block_size
+        return data[start : start + length]
@@ -0,0 +1,41 @@
+import pytest
+from paramiko import Transport
+from paramiko.sftp_client import SFTPClient
+
+from pytest_sftpserver.sftp.server import SFTPServer
+
+
+@pytest.yield_fixture
+def make_server():
+    """Return a factory for started `SFTPServer` instances that are closed after the test."""
+    servers = []
+
+    def _make_server(content_object=None, **kwargs):
+        server = SFTPServer(content_object, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield _make_server
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.yield_fixture
+def make_client():
+    """Return a factory connecting ``(transport, sftpclient)`` pairs to a server."""
+    transports = []
+
+    def _make_client(server, compression=False):
+        transport = Transport((server.host, server.port))
+        transports.append(transport)
+        transport.use_compression(compression)
+        transport.connect(username="a", password="b")
+        return transport, SFTPClient.from_transport(transport)
+
+    yield _make_client
+
+    for transport in transports:
+        transport.close()
@@ -1,8 +1,11 @@
 from copy import deepcopy
+from threading import Timer
 
 import pytest
 
-from pytest_sftpserver.sftp.content_provider import ContentProvider
+from pytest_sftpserver.sftp import content_provider as content_provider_module
+from pytest_sftpserver.sftp.content_provider import CompactContentProvider, ContentProvider
+from pytest_sftpserver.sftp.nodes import DirNode, from_nodes, to_nodes
 
 
 class Inner(object):
@@ -129,3 +132,156 @@ def test_get_size(content_provider):
 
 def test_str_and_byte(content_provider):
     assert set(content_provider.list(b"/")) == set(content_provider.list("/"))
+
+
+# fmt: off
+_CONTENT_OBJ_PLAIN = dict(
+    a=dict(
+        b="testfile1",
+        c=b"testfile2",
+        f=["testfile5", "testfile6"]
+    ),
+    d=3,
+)
+# fmt: on
+
+
+@pytest.fixture
+def compact_content_provider():
+    return CompactContentProvider(deepcopy(_CONTENT_OBJ_PLAIN))
+
+
+def test_to_nodes():
+    nodes = to_nodes(_CONTENT_OBJ_PLAIN)
+    assert isinstance(nodes, DirNode)
+    assert nodes["a"]["b"] == b"testfile1"
+    assert nodes["a"]["f"]["1"] == b"testfile6"
+    assert nodes["d"] == b"3"
+    assert to_nodes(nodes) is nodes
+
+
+def test_from_nodes():
+    # fmt: off
+    assert from_nodes(to_nodes(_CONTENT_OBJ_PLAIN)) == dict(
+        a=dict(
+            b=b"testfile1",
+            c=b"testfile2",
+            f={"0": b"testfile5", "1": b"testfile6"},
+        ),
+        d=b"3",
+    )
+    # fmt: on
+
+
+def test_compact_get(compact_content_provider):
+    assert compact_content_provider.get("/a/b") == b"testfile1"
+    assert compact_content_provider.get("/a/f/0")[:] == b"testfile5"
+    assert compact_content_provider.get("/a/NOTHERE") is None
+    assert compact_content_provider.get("/a/b/NOTHERE") is None
+
+
+def test_compact_put(compact_content_provider):
+    assert compact_content_provider.put("/a/e", u"testfile4")
+    assert compact_content_provider.get("/a/e") == b"testfile4"
+    assert compact_content_provider.put("/a/g", {})
+    assert compact_content_provider.is_dir("/a/g")
+    assert not compact_content_provider.put("/NOTHERE/e", "x")
+
+
+def test_compact_remove(compact_content_provider):
+    assert compact_content_provider.remove("/a/c")
+    assert not compact_content_provider.remove("/a/c")
+    assert set(compact_content_provider.list("/a")) == set(["b", "f"])
+
+
+def test_compact_is_dir(compact_content_provider):
+    assert compact_content_provider.is_dir("/")
+    assert compact_content_provider.is_dir("/a/f")
+    assert not compact_content_provider.is_dir("/a/c")
+    assert not compact_content_provider.is_dir("/d")
+
+
+def test_compact_get_size(compact_content_provider):
+    assert compact_content_provider.get_size("/a/b") == 9
+    assert compact_content_provider.get_size("/d") == 1
+
+
+def test_compact_to_plain(compact_content_provider):
+    compact_content_provider.content_object = {"x": u"y"}
+    assert compact_content_provider.to_plain() == {"x": b"y"}
+
+
+def test_bytes_is_file():
+    assert not ContentProvider({"a": b"bytes"}).is_dir("/a")
+
+
+def test_empty_root():
+    content_provider = ContentProvider({})
+    assert content_provider.is_dir("/")
+    assert content_provider.put("/a", "b")
+    assert content_provider.get("/a") == "b"
+
+
+def test_subscribe(content_provider):
+    events = []
+    content_provider.subscribe(lambda event, path: events.append((event, path)))
+    content_provider.put("/a/e", "testfile4")
+    content_provider.remove("/a/e")
+    assert not content_provider.remove("/a/e")
+    content_provider.notify("close", b"/a/x/")
+    assert events == [("put", "/a/e"), ("remove", "/a/e"), ("close", "/a/x")]
+
+
+def test_subscribe_filtered(content_provider):
+    events = []
+
+    def callback(event, path):
+        events.append((event, path))
+
+    content_provider.subscribe(callback, events=["remove"])
+    content_provider.put("/a/e", "testfile4")
+    content_provider.remove("/a/e")
+    content_provider.unsubscribe(callback)
+    content_provider.remove("/a/b")
+    assert events == [("remove", "/a/e")]
+
+
+def test_wait_for(content_provider):
+    assert not content_provider.wait_for("/a/e", timeout=0.01, event="put")
+    timer = Timer(0.05, content_provider.put, ("/a/e", "testfile4"))
+    timer.start()
+    assert content_provider.wait_for("/a/e", timeout=5, event="put")
+    timer.join()
+    # Already happened
+    assert content_provider.wait_for("a/e", timeout=0, event="put")
+
+
+def test_wait_for_reset(content_provider):
+    content_provider.put("/a/e", "testfile4")
+    content_provider.remove("/a/e")
+    assert not content_provider.wait_for("/a/e", timeout=0, event="put")
+    content_provider.put("/a/e", "testfile4")
+    content_provider.content_object = {}
+    assert not content_provider.wait_for("/a/e", timeout=0, event="put")
+
+
+def test_wait_for_since(content_provider):
+    content_provider.put("/a/e", "testfile4")
+    token = content_provider.mark()
+    # Only events after the token count
+    assert not content_provider.wait_for("/a/e", timeout=0, event="put", since=token)
+    timer = Timer(0.05, content_provider.put, ("/a/e", "testfile5"))
+    timer.start()
+    assert content_provider.wait_for("/a/e", timeout=5, event="put", since=token)
+    timer.join()
+    assert not content_provider.wait_for(
+        "/a/e", timeout=0, event="put", since=content_provider.mark()
+    )
+
+
+def test_seen_events_bounded(content_provider, monkeypatch):
+    monkeypatch.setattr(content_provider_module, "MAX_SEEN_PATHS", 2)
+    for name in "xyz":
+        content_provider.notify("put", "/" + name)
+    assert not content_provider.wait_for("/x", timeout=0, event="put")
+    assert content_provider.wait_for("/z", timeout=0, event="put")
@@ -0,0 +1,158 @@
+import tarfile
+
+import pytest
+
+from pytest_sftpserver.sftp import content_provider as content_provider_module
+from pytest_sftpserver.sftp.content_provider import ContentProvider
+from pytest_sftpserver.sftp.dump import _ChunkReader, dump
+from pytest_sftpserver.sftp.nodes import to_nodes
+from pytest_sftpserver.sftp.synthetic import PatternFile
+
+
+def _content():
+    return {"a": {"b": "testfile1", "c": b"testfile2", "f": ["x", "y"]}, "d": 3, "e": {}}
+
+
+def _read_tree(root):
+    return dict(
+        (p.relto(root).replace("\\", "/"), p.read_binary() if p.isfile() else None)
+        for p in root.visit()
+    )
+
+
+@pytest.mark.parametrize("convert", [lambda x: x, to_nodes])
+def test_dump_directory(tmpdir, convert):
+    content_provider = ContentProvider(convert(_content()))
+    written = dump(content_provider, tmpdir)
+    assert set(written) == set(["/a/b", "/a/c", "/a/f/0", "/a/f/1", "/d"])
+    assert _read_tree(tmpdir) == {
+        "a": None,
+        "a/b": b"testfile1",
+        "a/c": b"testfile2",
+        "a/f": None,
+        "a/f/0": b"x",
+        "a/f/1": b"y",
+        "d": b"3",
+        "e": None,
+    }
+
+
+def test_dump_directory_paths(tmpdir):
+    content_provider = ContentProvider(_content())
+    manifest = {}
+    dump(content_provider, tmpdir, manifest=manifest)
+    content_provider.put("/a/b", "changed")
+    content_provider.remove("/a/f")
+    content_provider.put("/e/new", {"g": "testfile3"})
+    written = dump(content_provider, tmpdir, ["/a/b", "/a/f", "/e/new", "/e/new/g"], manifest)
+    assert written == ["/a/b", "/e/new/g"]
+    assert tmpdir.join("a", "b").read_binary() == b"changed"
+    assert not tmpdir.join("a", "f").exists()
+    assert tmpdir.join("e", "new", "g").read_binary() == b"testfile3"
+
+
+def test_dump_directory_sync(tmpdir):
+    tmpdir.join("important.txt").write("x")
+    manifest = {}
+    content_provider = ContentProvider({"a": {"b": "c"}, "d": "e"})
+    dump(content_provider, tmpdir, manifest=manifest)
+    content_provider.content_object = {"d": {"f": "g"}}
+    tmpdir.join("a", "foreign").write("y")
+    dump(content_provider, tmpdir, manifest=manifest)
+    # Only what the previous dump wrote gets removed
+    assert _read_tree(tmpdir) == {
+        "a": None,
+        "a/foreign": b"y",
+        "d": None,
+        "d/f": b"g",
+        "important.txt": b"x",
+    }
+    content_provider.content_object = None
+    dump(content_provider, tmpdir, ["/"], manifest)
+    assert _read_tree(tmpdir) == {"a": None, "a/foreign": b"y", "important.txt": b"x"}
+    assert manifest == {}
+
+
+def test_dump_directory_without_manifest(tmpdir):
+    tmpdir.join("important.txt").write("x")
+    dump(ContentProvider({"a": "b"}), tmpdir)
+    dump(ContentProvider(None), tmpdir)
+    assert _read_tree(tmpdir) == {"a": b"b", "important.txt": b"x"}
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".tar.gz"])
+def test_dump_tar(tmpdir, suffix):
+    target = str(tmpdir.join("dump" + suffix))
+    content_provider = ContentProvider(_content())
+    dump(content_provider, target)
+    with tarfile.open(target) as tar:
+        assert tar.extractfile("a/b").read() == b"testfile1"
+        assert tar.getmember("e").isdir()
+
+
+def test_dump_tar_append(tmpdir):
+    target = str(tmpdir.join("dump.tar"))
+    content_provider = ContentProvider(_content())
+    dump(content_provider, target)
+    content_provider.put("/a/b", "changed")
+    assert dump(content_provider, target, ["/a/b"]) == ["/a/b"]
+    with tarfile.open(target) as tar:
+        assert tar.extractfile("a/b").read() == b"changed"
+        assert tar.extractfile("d").read() == b"3"
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda content_provider: content_provider.remove("/d"),
+        lambda content_provider: content_provider.put("/a", {"x": "y"}),
+        lambda content_provider: content_provider.put("/a/f", "file"),
+    ],
+)
+def test_dump_tar_rewrite(tmpdir, change):
+    target = str(tmpdir.join("dump.tar"))
+    content_provider = ContentProvider(_content())
+    manifest = {}
+    dump(content_provider, target, manifest=manifest)
+    content_provider.take_changed_paths()
+    change(content_provider)
+    dump(content_provider, target, content_provider.take_changed_paths(), manifest)
+    # Extracting the archive gives the current content, nothing removed comes back
+    tar_tree = tmpdir.mkdir("tar")
+    with tarfile.open(target) as tar:
+        tar.extractall(str(tar_tree))
+    dir_tree = tmpdir.mkdir("dir")
+    dump(content_provider, dir_tree)
+    assert _read_tree(tar_tree) == _read_tree(dir_tree)
+
+
+def test_chunk_reader():
+    node = PatternFile(b"0123456789", 25)
+    reader = _ChunkReader(node)
+    assert reader.read(3) == b"012"
+    assert reader.read(10) == b"3456789012"
+    assert reader.read() == b"345678901234"
+    assert reader.read(5) == b""
+
+
+def test_changed_paths():
+    content_provider = ContentProvider(_content())
+    assert content_provider.take_changed_paths() == set(["/"])
+    content_provider.put("/a/x", "y")
+    content_provider.remove("/d")
+    assert content_provider.changed_paths == set(["/a/x", "/d"])
+
+
+def test_dump_skips_non_file_content(tmpdir):
+    dump(ContentProvider({"a": 1.5, "b": "testfile1"}), tmpdir)
+    assert _read_tree(tmpdir) == {"b": b"testfile1"}
+
+
+def test_changed_paths_bounded(monkeypatch):
+    monkeypatch.setattr(content_provider_module, "MAX_CHANGED_PATHS", 3)
+    content_provider = ContentProvider({})
+    content_provider.take_changed_paths()
+    for i in range(10):
+        content_provider.put("/{}".format(i), "x")
+        content_provider.remove("/{}".format(i))
+    assert content_provider.take_changed_paths() == set(["/"])
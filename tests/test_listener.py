@@ -0,0 +1,130 @@
+import socket
+import sys
+
+import pytest
+from paramiko import Transport
+from paramiko.sftp_client import SFTPClient
+
+from pytest_sftpserver.sftp.listener import Listener, parse_address
+from pytest_sftpserver.sftp.server import SFTPServer
+
+needs_unix = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX") or sys.platform == "win32", reason="Needs unix sockets"
+)
+
+
+def _ipv6_available():
+    if not socket.has_ipv6:
+        return False
+    try:
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+        sock.bind(("::1", 0))
+        sock.close()
+        return True
+    except (OSError, socket.error):
+        return False
+
+
+needs_ipv6 = pytest.mark.skipif(not _ipv6_available(), reason="Needs IPv6")
+
+
+def _read(listener, path):
+    transport = Transport(listener.connect())
+    try:
+        transport.connect(username="a", password="b")
+        sftpclient = SFTPClient.from_transport(transport)
+        with sftpclient.open(path, "r") as f:
+            return f.read()
+    finally:
+        transport.close()
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("127.0.0.1:0", ("127.0.0.1", 0)),
+        ("localhost:2222", ("localhost", 2222)),
+        ("[::1]:0", ("::1", 0)),
+        ("unix:/tmp/sftp.sock", "/tmp/sftp.sock"),
+    ],
+)
+def test_parse_address(value, expected):
+    assert parse_address(value) == expected
+
+
+@pytest.mark.parametrize("value", ["127.0.0.1", "localhost:port"])
+def test_parse_address_invalid(value):
+    with pytest.raises(ValueError):
+        parse_address(value)
+
+
+def test_listener_details():
+    listener = Listener(socket.AF_INET, ("127.0.0.1", 22))
+    assert (listener.host, listener.port, listener.path) == ("127.0.0.1", 22, None)
+    assert listener.url == "sftp://user:pw@127.0.0.1:22/"
+    listener = Listener(socket.AF_INET6, ("::1", 22, 0, 0))
+    assert listener.url == "sftp://user:pw@[::1]:22/"
+
+
+@needs_unix
+def test_unix_socket(make_server, tmpdir):
+    path = str(tmpdir.join("sftp.sock"))
+    server = make_server({"a": "testfile1"}, addresses=[path])
+    listener, = server.listeners
+    assert listener.path == path
+    assert server.host is None and server.url is None
+    assert _read(listener, "/a") == b"testfile1"
+
+
+@needs_unix
+def test_unix_socket_stale(tmpdir):
+    path = str(tmpdir.join("sftp.sock"))
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    server = SFTPServer(addresses=[path])
+    server.server_close()
+    assert not tmpdir.join("sftp.sock").exists()
+
+
+@needs_unix
+def test_unix_socket_in_use(make_server, tmpdir):
+    path = str(tmpdir.join("sftp.sock"))
+    server = make_server({"a": "testfile1"}, addresses=[path])
+    with pytest.raises((OSError, socket.error)):
+        SFTPServer(addresses=[path])
+    assert _read(server.listeners[0], "/a") == b"testfile1"
+
+
+@needs_unix
+def test_unix_socket_close_replaced(tmpdir):
+    path = str(tmpdir.join("sftp.sock"))
+    server = SFTPServer(addresses=[path])
+    tmpdir.join("sftp.sock").remove()
+    other = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    other.bind(path)
+    try:
+        server.server_close()
+        # The socket file now belongs to someone else and is kept
+        assert tmpdir.join("sftp.sock").exists()
+    finally:
+        other.close()
+
+
+@needs_ipv6
+def test_ipv6(make_server):
+    server = make_server({"a": "testfile1"}, addresses=[("::1", 0)])
+    assert server.host == "::1"
+    assert "[::1]" in server.url
+    assert _read(server.listeners[0], "/a") == b"testfile1"
+
+
+def test_multiple_listeners(make_server, tmpdir):
+    addresses = [("127.0.0.1", 0), ("127.0.0.1", 0)]
+    if hasattr(socket, "AF_UNIX") and sys.platform != "win32":
+        addresses.append(str(tmpdir.join("sftp.sock")))
+    server = make_server({"a": "testfile1"}, addresses=addresses)
+    assert len(server.listeners) == len(addresses)
+    assert server.port == server.listeners[0].port
+    for listener in server.listeners:
+        assert _read(listener, "/a") == b"testfile1"
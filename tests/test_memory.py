@@ -0,0 +1,295 @@
+from threading import Thread
+
+import pytest
+from paramiko.sftp import SFTP_FAILURE, SFTP_OK
+
+from pytest_sftpserver.sftp.content_provider import ContentProvider
+from pytest_sftpserver.sftp.interface import VirtualSFTPHandle
+from pytest_sftpserver.sftp.memory import MemoryAccounting, QuotaExceededError, resident_size
+from pytest_sftpserver.sftp.nodes import to_nodes
+from pytest_sftpserver.sftp.synthetic import ZeroFile
+
+
+def _content_provider(**kwargs):
+    content_provider = ContentProvider({"a": {"b": "testfile1"}, "up": {}})
+    content_provider.memory = MemoryAccounting(**kwargs)
+    return content_provider
+
+
+def test_resident_size():
+    assert resident_size(u"abc") == 3
+    assert resident_size(b"abcd") == 4
+    assert resident_size(123) == 3
+    assert resident_size(ZeroFile(1000)) == 0
+    assert resident_size({"a": "b"}) == 0
+
+
+def test_get_usage():
+    content_provider = ContentProvider(
+        {"a": {"b": "testfile1", "c": to_nodes({"d": "xx"})}, "e": ZeroFile(100), "f": 12}
+    )
+    assert content_provider.get_usage() == 13
+    assert content_provider.get_usage("/a") == 11
+    assert content_provider.get_usage("/a/c") == 2
+
+
+def test_stored_bytes():
+    content_provider = _content_provider()
+    content_provider.put("/up/x", b"12345")
+    content_provider.put("/up/y", b"123")
+    content_provider.put("/up/x", b"1")
+    content_provider.put("/up/dir", {})
+    assert content_provider.memory.stored_bytes == 4
+    assert content_provider.memory.stored_files == 2
+    content_provider.remove("/up")
+    assert content_provider.memory.stored_bytes == 0
+    content_provider.put("/z", b"123")
+    content_provider.content_object = {}
+    assert content_provider.memory.stored_bytes == 0
+
+
+def test_reject():
+    content_provider = _content_provider(limit=10)
+    content_provider.put("/up/x", b"12345")
+    content_provider.put("/up/x", b"1234567890")
+    with pytest.raises(QuotaExceededError):
+        content_provider.put("/up/y", b"1")
+    assert content_provider.get("/up/y") is None
+    assert content_provider.memory.rejected_writes == 1
+
+
+def test_evict():
+    evicted = []
+    content_provider = _content_provider(
+        limit=10, policy="evict", on_evict=lambda path, size: evicted.append((path, size))
+    )
+    content_provider.put("/up/x", b"1234")
+    content_provider.put("/up/y", b"1234")
+    content_provider.touch("/up/x")
+    content_provider.put("/up/z", b"1234")
+    assert evicted == [("/up/y", 4)]
+    assert set(content_provider.list("/up")) == set(["x", "z"])
+    assert content_provider.memory.stored_bytes == 8
+    # Can't make room by evicting other files
+    with pytest.raises(QuotaExceededError):
+        content_provider.put("/up/z", b"12345678901")
+    assert content_provider.memory.evicted_files == 2
+    assert content_provider.memory.evicted_bytes == 8
+
+
+def test_rename():
+    evicted = []
+    content_provider = _content_provider(
+        limit=10, policy="evict", on_evict=lambda path, size: evicted.append((path, size))
+    )
+    content_provider.put("/up/x", b"12345678")
+    # Renaming doesn't need additional memory
+    assert content_provider.rename("/up/x", "/up/y")
+    assert evicted == []
+    assert content_provider.get("/up/y") == b"12345678"
+    content_provider.put("/up/dir", {})
+    content_provider.put("/up/dir/z", b"1")
+    assert content_provider.rename("/up/dir", "/up/moved")
+    assert content_provider.memory.stored_bytes == 9
+    assert content_provider.memory.stored_files == 2
+    content_provider.remove("/up/moved")
+    assert content_provider.memory.stored_bytes == 8
+
+
+def test_push_pop():
+    content_provider = _content_provider(limit=10)
+    content_provider.put("/up/x", b"12345678")
+    content_provider.memory.push()
+    content_provider.content_object = {"up": {}}
+    # The outer content is still in memory and counts against the limit
+    with pytest.raises(QuotaExceededError):
+        content_provider.put("/up/y", b"12345678")
+    content_provider.put("/up/y", b"12")
+    assert content_provider.memory.stored_bytes == 10
+    content_provider.memory.pop()
+    assert content_provider.memory.stored_bytes == 8
+    assert content_provider.memory.stored_files == 1
+
+
+def test_concurrent_puts():
+    content_provider = _content_provider(limit=100)
+    errors = []
+
+    def put(i):
+        try:
+            content_provider.put("/up/{}".format(i), b"x" * 30)
+        except QuotaExceededError:
+            errors.append(i)
+
+    threads = [Thread(target=put, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 17
+    assert content_provider.memory.stored_bytes == 90
+    assert len(content_provider.list("/up")) == 3
+
+
+def test_get_usage_leaves():
+    class Custom(object):
+        def method(self):
+            raise AssertionError("must not be called")
+
+    content_provider = ContentProvider({"a": 1.5, "b": Custom(), "c": ["xy", ("z",)]})
+    assert content_provider.get_usage() == 3
+    assert list(content_provider.walk("/a")) == [("/a", 1.5)]
+
+
+def test_get_usage_running_total():
+    content_provider = _content_provider()
+    assert content_provider.get_usage() == 9
+    content_provider.put("/up/x", b"12345")
+    content_provider.put("/a/b", b"1")
+    content_provider.put("/up/dir", {"y": "12"})
+    assert content_provider.get_usage() == 8
+    content_provider.rename("/up", "/moved")
+    content_provider.remove("/a")
+    assert content_provider.get_usage() == 7
+    content_provider.content_object = {"z": "123"}
+    assert content_provider.get_usage() == 3
+
+
+def test_evict_skips_open_writes():
+    content_provider = _content_provider(limit=10, policy="evict")
+    content_provider.begin_write("/up/a")
+    content_provider.put("/up/a", b"12345")
+    with pytest.raises(QuotaExceededError):
+        content_provider.put("/up/b", b"12345678")
+    content_provider.end_write("/up/a")
+    content_provider.put("/up/b", b"12345678")
+    assert content_provider.get("/up/a") is None
+
+
+def test_put_missing_parent_doesnt_evict():
+    content_provider = _content_provider(limit=10, policy="evict")
+    content_provider.put("/up/a", b"12345")
+    assert not content_provider.put("/missing/b", b"12345678")
+    assert content_provider.get("/up/a") == b"12345"
+    assert content_provider.memory.evicted_files == 0
+
+
+def test_vanished_file_write():
+    content_provider = _content_provider(limit=10, policy="evict")
+    handle = VirtualSFTPHandle("/up/a", content_provider)
+    assert handle.write(0, b"12345") == SFTP_OK
+    content_provider.remove("/up/a")
+    assert handle.write(5, b"67890") == SFTP_FAILURE
+    assert content_provider.get("/up/a") is None
+    handle.close()
+
+
+def test_rename_uses_put_and_remove():
+    calls = []
+
+    class LoggingContentProvider(ContentProvider):
+        def put(self, path, data):
+            calls.append(("put", path))
+            return super(LoggingContentProvider, self).put(path, data)
+
+        def remove(self, path):
+            calls.append(("remove", path))
+            return super(LoggingContentProvider, self).remove(path)
+
+    content_provider = LoggingContentProvider({"up": {"x": b"12345"}})
+    content_provider.memory = MemoryAccounting(limit=10, policy="evict")
+    content_provider.put("/up/x", b"12345")
+    del calls[:]
+    assert content_provider.rename("/up/x", "/up/y")
+    assert calls == [("put", "/up/y"), ("remove", "/up/x")]
+    assert content_provider.memory.stored_bytes == 5
+    assert content_provider.memory.evicted_files == 0
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        MemoryAccounting(policy="other")
+
+
+def test_sftpserver_serve_content(make_server, make_client):
+    server = make_server({"up": {}}, memory_limit=10)
+    _, sftpclient = make_client(server)
+    with sftpclient.open("/up/a", "w") as f:
+        f.write(b"x" * 8)
+    with server.serve_content({"up": {}}):
+        pass
+    with pytest.raises(IOError):
+        with sftpclient.open("/up/b", "w") as f:
+            f.write(b"x" * 8)
+    assert server.metrics()["stored_bytes"] == 8
+
+
+def test_sftpserver_rename(make_server, make_client):
+    evicted = []
+    server = make_server(
+        {"up": {}},
+        memory_limit=10,
+        memory_policy="evict",
+        on_evict=lambda path, size: evicted.append((path, size)),
+    )
+    _, sftpclient = make_client(server)
+    with sftpclient.open("/up/x", "w") as f:
+        f.write(b"x" * 8)
+    sftpclient.rename("/up/x", "/up/y")
+    assert sftpclient.listdir("/up") == ["y"]
+    assert evicted == []
+    assert server.metrics()["stored_bytes"] == 8
+
+
+def test_sftpserver_reject(make_server, make_client):
+    server = make_server({"up": {}}, memory_limit=100)
+    _, sftpclient = make_client(server)
+    with sftpclient.open("/up/a", "w") as f:
+        f.write(b"x" * 60)
+    with pytest.raises(IOError):
+        with sftpclient.open("/up/b", "w") as f:
+            f.write(b"x" * 60)
+    metrics = server.metrics()
+    assert metrics["stored_bytes"] == 60
+    assert metrics["rejected_writes"] == 1
+    assert metrics["memory_limit"] == 100
+
+
+def test_sftpserver_evict(make_server, make_client):
+    evicted = []
+    server = make_server(
+        {"up": {}},
+        memory_limit=100,
+        memory_policy="evict",
+        on_evict=lambda path, size: evicted.append((path, size)),
+    )
+    _, sftpclient = make_client(server)
+    for name in "abc":
+        with sftpclient.open("/up/" + name, "w") as f:
+            f.write(b"x" * 40)
+    assert evicted == [("/up/a", 40)]
+    assert sorted(sftpclient.listdir("/up")) == ["b", "c"]
+    assert server.metrics() == dict(
+        total_bytes=80,
+        stored_bytes=80,
+        stored_files=2,
+        memory_limit=100,
+        evicted_files=1,
+        evicted_bytes=40,
+        rejected_writes=0,
+    )
+
+
+def test_sftpserver_evict_open_upload(make_server, make_client):
+    server = make_server({"up": {}}, memory_limit=10, memory_policy="evict")
+    _, sftpclient = make_client(server)
+    _, other_sftpclient = make_client(server)
+    with sftpclient.open("/up/a", "w") as f:
+        f.write(b"12345")
+        f.flush()
+        # Still being written, can't be evicted
+        with pytest.raises(IOError):
+            with other_sftpclient.open("/up/b", "w") as other:
+                other.write(b"12345678")
+        f.write(b"67890")
+    assert server.content_provider.get("/up/a") == b"1234567890"
@@ -0,0 +1,137 @@
+import os
+import pickle
+import tarfile
+import zipfile
+
+import pytest
+
+from pytest_sftpserver.sftp.content_provider import ContentProvider
+from pytest_sftpserver.sftp.mount import LazyFile, _LRUCache, mount
+
+FILES = {"a/b.txt": b"testfile1", "a/c/d.txt": b"testfile2", "e.txt": b"testfile3" * 100}
+
+
+@pytest.fixture
+def source_dir(tmpdir):
+    root = tmpdir.mkdir("source")
+    for name, data in FILES.items():
+        root.join(name).write_binary(data, ensure=True)
+    root.mkdir("empty")
+    return root
+
+
+@pytest.fixture(params=["dir", "zip", "tar", "tar.gz"])
+def mount_path(request, source_dir, tmpdir):
+    if request.param == "dir":
+        return str(source_dir)
+    archive = str(tmpdir.join("archive." + request.param))
+    if request.param == "zip":
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in FILES.items():
+                zf.writestr(name, data)
+            zf.writestr("empty/", b"")
+    else:
+        mode = "w:gz" if request.param == "tar.gz" else "w"
+        with tarfile.open(archive, mode) as tf:
+            tf.add(str(source_dir), arcname=".")
+    return archive
+
+
+def test_mount_tree(mount_path):
+    with mount(mount_path) as root:
+        content_provider = ContentProvider(root)
+        assert set(content_provider.list("/")) == set(["a", "e.txt", "empty"])
+        assert set(content_provider.list("/a")) == set(["b.txt", "c"])
+        assert content_provider.is_dir("/a/c")
+        assert content_provider.is_dir("/empty")
+        assert not content_provider.is_dir("/a/c/d.txt")
+        assert content_provider.get_size("/e.txt") == 900
+
+
+def test_mount_read(mount_path):
+    with mount(mount_path) as root:
+        content_provider = ContentProvider(root)
+        assert content_provider.get("/a/b.txt")[:] == b"testfile1"
+        assert content_provider.get("/a/c/d.txt")[4:8] == b"file"
+        assert content_provider.get("/e.txt")[895:2000] == b"file3"
+        assert content_provider.get("/e.txt")[2000:3000] == b""
+
+
+def test_mount_pickle(mount_path):
+    with mount(mount_path) as root:
+        root = pickle.loads(pickle.dumps(root))
+        assert root["a"]["b.txt"][:] == b"testfile1"
+        root.close()
+
+
+def test_mount_invalid(tmpdir):
+    path = tmpdir.join("invalid")
+    path.write("not an archive")
+    with pytest.raises(ValueError):
+        mount(str(path))
+
+
+def test_lazy_file_slice_only(mount_path):
+    with mount(mount_path) as root:
+        assert isinstance(root["e.txt"], LazyFile)
+        with pytest.raises(TypeError):
+            root["e.txt"][0]
+
+
+def test_lru_cache():
+    loads = []
+
+    def loader(value):
+        def _load():
+            loads.append(value)
+            return value
+
+        return _load
+
+    cache = _LRUCache(6)
+    assert cache.get("a", loader(b"aaa")) == b"aaa"
+    assert cache.get("b", loader(b"bbb")) == b"bbb"
+    assert cache.get("a", loader(b"aaa")) == b"aaa"
+    assert cache.get("c", loader(b"ccc")) == b"ccc"
+    # "b" was least recently used and got evicted
+    assert cache.get("b", loader(b"bbb")) == b"bbb"
+    assert loads == [b"aaa", b"bbb", b"ccc", b"bbb"]
+    assert cache.size == 6
+
+
+def test_lru_cache_oversize():
+    cache = _LRUCache(6)
+    cache.get("a", lambda: b"aaa")
+    assert cache.get("big", lambda: b"x" * 7) == b"x" * 7
+    # Members larger than the cache aren't kept and don't evict others
+    assert cache.size == 3
+    assert cache.get("a", lambda: b"reloaded") == b"aaa"
+
+
+@pytest.mark.parametrize("kind", ["zip", "tgz"])
+def test_mount_oversize_member_streamed(tmpdir, kind):
+    data = os.urandom(100000)
+    source = tmpdir.mkdir("src")
+    source.join("big").write_binary(data)
+    if kind == "zip":
+        archive = str(tmpdir.join("archive.zip"))
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(str(source.join("big")), "big")
+    else:
+        archive = str(tmpdir.join("archive.tgz"))
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(str(source.join("big")), "big")
+
+    root = mount(archive, cache_size=10000)
+    opened = []
+    open_member = root.source._open_member
+    root.source._open_member = lambda key: opened.append(key) or open_member(key)
+    root.source._read_member = None
+    with root:
+        node = root["big"]
+        chunks = [node[offset : offset + 4096] for offset in range(0, len(data), 4096)]
+        assert b"".join(chunks) == data
+        # Sequential reads decompress the member once, going back reopens it
+        assert opened == ["big"]
+        assert node[10:20] == data[10:20]
+        assert opened == ["big", "big"]
@@ -0,0 +1,13 @@
+import subprocess
+import sys
+
+
+def test_plugin_import_is_lazy():
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, pytest_sftpserver.plugin; print('paramiko' in sys.modules)",
+        ]
+    )
+    assert output.strip() == b"False"
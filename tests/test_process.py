@@ -0,0 +1,153 @@
+import time
+from copy import deepcopy
+
+import pytest
+from paramiko import Transport
+from paramiko.sftp_client import SFTPClient
+
+from pytest_sftpserver.sftp.memory import QuotaExceededError
+from pytest_sftpserver.sftp.process import SFTPServerProcess
+
+# fmt: off
+CONTENT_OBJ = dict(
+    a=dict(
+        b="testfile1",
+        f=["testfile5", "testfile6"]
+    ),
+    d="testfile3"
+)
+# fmt: on
+
+
+@pytest.yield_fixture(scope="module")
+def server_process():
+    server = SFTPServerProcess()
+    server.start()
+    yield server
+    if server.is_alive():
+        server.shutdown()
+
+
+@pytest.yield_fixture(scope="module")
+def sftpclient(server_process):
+    transport = Transport((server_process.host, server_process.port))
+    transport.connect(username="a", password="b")
+    sftpclient = SFTPClient.from_transport(transport)
+    yield sftpclient
+    sftpclient.close()
+    transport.close()
+
+
+@pytest.yield_fixture
+def content(server_process):
+    with server_process.serve_content(deepcopy(CONTENT_OBJ)):
+        yield
+
+
+def test_process_started(server_process):
+    assert server_process.is_alive()
+    assert server_process.wait_for_bind()
+    assert server_process.startup_time > 0
+    assert str(server_process.port) in server_process.url
+
+
+def test_process_listdir_empty(sftpclient):
+    assert sftpclient.listdir("/") == []
+
+
+def test_process_get_file(content, sftpclient):
+    with sftpclient.open("/a/b", "r") as f:
+        assert f.read() == b"testfile1"
+
+
+def test_process_put_file(content, server_process, sftpclient):
+    with sftpclient.open("/e", "w") as f:
+        f.write("testfile4")
+    assert server_process.content_provider.get("/e") == b"testfile4"
+    assert set(server_process.content_provider.list("/")) == set(["a", "d", "e"])
+    assert server_process.content_provider.content_object["e"] == b"testfile4"
+
+
+def test_process_serve_content_restores(server_process):
+    with server_process.serve_content({"x": "y"}):
+        assert server_process.content_provider.get("/x") == "y"
+    assert server_process.content_provider.content_object is None
+
+
+def test_process_error(server_process):
+    with pytest.raises(AttributeError):
+        server_process._call("no_such_command")
+
+
+def test_process_shutdown():
+    server = SFTPServerProcess({"a": "b"})
+    server.start()
+    assert server.content_provider.get("/a") == "b"
+    server.shutdown()
+    assert not server.is_alive()
+    assert server.teardown_time > 0
+
+
+def test_process_dump(content, server_process, sftpclient, tmpdir):
+    assert len(server_process.dump(tmpdir)) == 4
+    with sftpclient.open("/e", "w") as f:
+        f.write("testfile4")
+    assert server_process.dump(tmpdir) == ["/e"]
+
+
+def test_process_wait_for(content, server_process, sftpclient):
+    with sftpclient.open("/e", "w") as f:
+        f.write("testfile4")
+    assert server_process.wait_for("/e", timeout=5)
+    assert not server_process.wait_for("/x", timeout=0.01)
+    assert not server_process.wait_for("/e", timeout=0, since=server_process.mark())
+
+
+def test_process_metrics(content, server_process, sftpclient):
+    with sftpclient.open("/e", "w") as f:
+        f.write("testfile4")
+    metrics = server_process.metrics()
+    assert metrics["stored_bytes"] == 9
+    assert metrics["total_bytes"] == server_process.content_provider.get_usage() == 45
+
+
+def test_process_quota_error():
+    server = SFTPServerProcess({"a": {}}, memory_limit=5)
+    server.start()
+    try:
+        with pytest.raises(QuotaExceededError):
+            server.content_provider.put("/a/b", "testfile1")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_process_subscribe(content, server_process, sftpclient):
+    events = []
+
+    def callback(event, path):
+        events.append((event, path))
+
+    server_process.subscribe(callback, events=["close"])
+    try:
+        token = server_process.mark()
+        with sftpclient.open("/e", "w") as f:
+            f.write("testfile4")
+        assert server_process.wait_for("/e", timeout=5, since=token)
+        # Events arrive asynchronously in the parent process
+        for _ in range(100):
+            if events:
+                break
+            time.sleep(0.01)
+    finally:
+        server_process.unsubscribe(callback)
+    assert events == [("close", "/e")]
+
+
+def test_process_served_object_is_copy(server_process, sftpclient):
+    content_object = {"up": {}}
+    with server_process.serve_content(content_object):
+        with sftpclient.open("/up/x", "w") as f:
+            f.write("hi")
+        assert server_process.content_provider.content_object == {"up": {"x": b"hi"}}
+    assert content_object == {"up": {}}
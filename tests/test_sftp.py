@@ -1,4 +1,6 @@
+import hashlib
 import sys
+import zipfile
 from copy import deepcopy
 
 import pytest
@@ -6,7 +8,11 @@ from paramiko import Transport
 from paramiko.channel import Channel
 from paramiko.sftp_client import SFTPClient
 
+from pytest_sftpserver.sftp.content_provider import ContentProvider
+from pytest_sftpserver.sftp.mount import mount
+from pytest_sftpserver.sftp.nodes import to_nodes
 from pytest_sftpserver.sftp.server import SFTPServer
+from pytest_sftpserver.sftp.synthetic import RandomFile
 
 # fmt: off
 CONTENT_OBJ = dict(
@@ -188,3 +194,124 @@ def test_sftpserver_chmod_non_existing(sftpclient, sftpserver):
     with sftpserver.serve_content({}):
         with pytest.raises(IOError):
             sftpclient.chmod("/a", 600)
+
+
+def test_sftpserver_synthetic_file(sftpclient, sftpserver):
+    node = RandomFile(100000, seed=1)
+    with sftpserver.serve_content({"a": node}):
+        assert sftpclient.stat("/a").st_size == 100000
+        with sftpclient.open("/a", "r") as f:
+            f.seek(50000)
+            assert f.read(10) == node[50000:50010]
+            f.seek(0)
+            assert hashlib.md5(f.read()).hexdigest() == node.checksum()
+
+
+def test_sftpserver_put_file_multiple_chunks(content, sftpclient, sftpserver):
+    data = b"x" * 100000
+    with sftpclient.open("/a/big", "w") as f:
+        f.write(data)
+    assert sftpserver.content_provider.get("/a/big") == data
+    assert sftpclient.stat("/a/big").st_size == len(data)
+
+
+def test_sftpserver_nodes(sftpclient, sftpserver):
+    with sftpserver.serve_content(to_nodes(deepcopy(CONTENT_OBJ))):
+        assert set(sftpclient.listdir("/a")) == set(["b", "c", "f"])
+        with sftpclient.open("/a/f/0", "r") as f:
+            assert f.read() == b"testfile5"
+        with sftpclient.open("/a/f/1", "rw") as f:
+            f.seek(4)
+            f.write(b"test")
+        assert sftpserver.content_provider.get("/a/f/1") == b"testtest6"
+        sftpclient.mkdir("/a/x")
+        sftpclient.rename("/a/b", "/a/x/b")
+        assert sftpclient.listdir("/a/x") == ["b"]
+        sftpclient.remove("/a/x/b")
+        assert sftpclient.listdir("/a/x") == []
+
+
+def test_sftpserver_mount(sftpclient, sftpserver, tmpdir):
+    archive = str(tmpdir.join("archive.zip"))
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a/b", b"testfile1")
+    with mount(archive) as root, sftpserver.serve_content(root):
+        assert sftpclient.listdir("/a") == ["b"]
+        with sftpclient.open("/a/b", "r") as f:
+            assert f.read() == b"testfile1"
+        with sftpclient.open("/a/c", "w") as f:
+            f.write(b"testfile2")
+        assert set(sftpclient.listdir("/a")) == set(["b", "c"])
+
+
+def test_sftpserver_dump(content, sftpclient, sftpserver, tmpdir):
+    tmpdir.join("important.txt").write("x")
+    assert len(sftpserver.dump(tmpdir)) == 5
+    with sftpclient.open("/a/new", "w") as f:
+        f.write("testfile4")
+    sftpclient.remove("/d")
+    assert sftpserver.dump(tmpdir) == ["/a/new"]
+    assert tmpdir.join("a", "new").read() == "testfile4"
+    assert not tmpdir.join("d").exists()
+    assert len(sftpserver.dump(tmpdir, full=True)) == 5
+    assert tmpdir.join("important.txt").read() == "x"
+
+
+def test_sftpserver_bound_before_start():
+    server = SFTPServer()
+    try:
+        assert server.host == "127.0.0.1"
+        assert server.port > 0
+    finally:
+        server.server_close()
+
+
+def test_sftpserver_wait_for(content, sftpclient, sftpserver):
+    events = []
+
+    def callback(event, path):
+        events.append((event, path))
+
+    sftpserver.subscribe(callback)
+    try:
+        with sftpclient.open("/a/upload", "w") as f:
+            f.write("testfile4")
+            assert not sftpserver.wait_for("/a/upload", timeout=0)
+        assert sftpserver.wait_for("/a/upload", timeout=5)
+        with sftpclient.open("/a/empty", "w"):
+            pass
+        assert sftpserver.wait_for("/a/empty", timeout=5)
+        token = sftpserver.mark()
+        assert not sftpserver.wait_for("/a/upload", timeout=0, since=token)
+        with sftpclient.open("/a/upload", "w") as f:
+            f.write("testfile5")
+        assert sftpserver.wait_for("/a/upload", timeout=5, since=token)
+    finally:
+        sftpserver.unsubscribe(callback)
+    assert ("write", "/a/upload") in events
+    assert events.index(("close", "/a/upload")) > events.index(("write", "/a/upload"))
+
+
+class DuckTypedContentProvider(object):
+    """A provider without any of the optional hooks."""
+
+    def __init__(self, content_object):
+        self.content_provider = ContentProvider(content_object)
+
+    def __getattr__(self, name):
+        if name in ("get", "put", "remove", "list", "is_dir", "get_size"):
+            return getattr(self.content_provider, name)
+        raise AttributeError(name)
+
+
+def test_sftpserver_duck_typed_provider(make_server, make_client):
+    server = make_server(
+        {"a": {"b": "testfile1"}}, content_provider_class=DuckTypedContentProvider
+    )
+    _, sftpclient = make_client(server)
+    with sftpclient.open("/a/b", "r") as f:
+        assert f.read() == b"testfile1"
+    with sftpclient.open("/a/c", "w") as f:
+        f.write("testfile2")
+    sftpclient.rename("/a/c", "/a/d")
+    assert sorted(sftpclient.listdir("/a")) == ["b", "d"]
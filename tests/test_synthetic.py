@@ -0,0 +1,75 @@
+import hashlib
+
+import pytest
+
+from pytest_sftpserver.sftp.content_provider import ContentProvider
+from pytest_sftpserver.sftp import synthetic
+from pytest_sftpserver.sftp.synthetic import PatternFile, RandomFile, ZeroFile
+
+
+def test_zero_file():
+    node = ZeroFile(10)
+    assert len(node) == 10
+    assert node[2:5] == b"\x00\x00\x00"
+    assert node[8:20] == b"\x00\x00"
+    assert node[20:30] == b""
+
+
+def test_pattern_file():
+    node = PatternFile("abc", 10)
+    assert len(node) == 10
+    assert node[:] == b"abcabcabca"
+    assert node[4:9] == b"bcabc"
+    assert node[9:100] == b"a"
+
+
+def test_random_file_deterministic():
+    size = RandomFile.block_size * 2 + 100
+    data = RandomFile(size, seed=1)[:]
+    assert len(data) == size
+    assert RandomFile(size, seed=1)[:] == data
+    assert RandomFile(size, seed=2)[:] != data
+
+
+@pytest.mark.skipif(not hasattr(hashlib, "shake_128"), reason="Needs Python 3.6+")
+def test_random_file_stable():
+    # The content must not depend on the platform or on hash randomization
+    data = RandomFile(1000, seed=7)[:]
+    assert hashlib.md5(data).hexdigest() == "74dca0fa92e778f0bb25db0479eae692"
+
+
+def test_random_bytes_fallback(monkeypatch):
+    monkeypatch.delattr(synthetic.hashlib, "shake_128", raising=False)
+    data = synthetic._random_bytes(b"1:0", 1000)
+    assert len(data) == 1000
+    assert synthetic._random_bytes(b"1:0", 1000) == data
+    assert synthetic._random_bytes(b"1:1", 1000) != data
+
+
+def test_random_file_slices():
+    size = RandomFile.block_size * 3
+    node = RandomFile(size, seed=3)
+    data = node[:]
+    for start, stop in [(0, 1), (100, 200), (size // 3 - 5, size // 3 + 5), (size - 10, size)]:
+        assert RandomFile(size, seed=3)[start:stop] == data[start:stop]
+
+
+@pytest.mark.parametrize(
+    "node", [ZeroFile(100000), PatternFile(b"xyz", 100000), RandomFile(100000, seed=5)]
+)
+def test_checksum(node):
+    assert node.checksum() == hashlib.md5(node[:]).hexdigest()
+    assert node.checksum("sha256") == hashlib.sha256(node[:]).hexdigest()
+
+
+def test_slice_only():
+    with pytest.raises(TypeError):
+        ZeroFile(10)[1]
+    with pytest.raises(ValueError):
+        ZeroFile(10)[::2]
+
+
+def test_content_provider():
+    content_provider = ContentProvider({"big": ZeroFile(10 * 1024 ** 3)})
+    assert not content_provider.is_dir("/big")
+    assert content_provider.get_size("/big") == 10 * 1024 ** 3
@@ -0,0 +1,50 @@
+import pytest
+
+from pytest_sftpserver.sftp.server import FAST_CIPHERS, SFTPServer
+
+
+CONTENT_OBJ = {"a": "testfile1" * 10000}
+
+
+def _read(sftpclient):
+    with sftpclient.open("/a", "r") as f:
+        return f.read()
+
+
+def test_ciphers(make_server, make_client):
+    server = make_server(CONTENT_OBJ, ciphers=["aes256-ctr"], digests=["hmac-sha1"])
+    transport, sftpclient = make_client(server)
+    assert transport.local_cipher == "aes256-ctr"
+    assert transport.local_mac == "hmac-sha1"
+    assert _read(sftpclient) == b"testfile1" * 10000
+
+
+def test_fast_ciphers(make_server, make_client):
+    server = make_server(CONTENT_OBJ, ciphers=FAST_CIPHERS + ("no-such-cipher",))
+    transport, sftpclient = make_client(server)
+    assert transport.local_cipher in FAST_CIPHERS
+    assert _read(sftpclient) == b"testfile1" * 10000
+
+
+@pytest.mark.parametrize("compression", [True, False])
+def test_compression(make_server, make_client, compression):
+    server = make_server(CONTENT_OBJ, compression=compression)
+    transport, sftpclient = make_client(server, compression=True)
+    assert (transport.local_compression != "none") is compression
+    assert _read(sftpclient) == b"testfile1" * 10000
+
+
+def test_window_and_packet_size(make_server, make_client):
+    server = make_server(CONTENT_OBJ, window_size=8 * 1024 * 1024, max_packet_size=64 * 1024)
+    transport, sftpclient = make_client(server)
+    # The client's outgoing limits are the server's incoming limits
+    channel = sftpclient.get_channel()
+    assert channel.out_max_packet_size == 64 * 1024
+    assert channel.out_window_size > 2 * 1024 * 1024
+    assert _read(sftpclient) == b"testfile1" * 10000
+
+
+@pytest.mark.parametrize("kwargs", [dict(ciphers=["nope"]), dict(digests=("nope", "nope2"))])
+def test_unsupported_algorithms(kwargs):
+    with pytest.raises(ValueError):
+        SFTPServer(**kwargs)